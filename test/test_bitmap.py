@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+'''
+test_bitmap.py - Class for testing the bitmap representation of intervals
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from nose.tools import assert_equal, raises
+
+from time_intervals.intervals import *
+from time_intervals import bitmap
+from time_intervals.bitmap import Bitmap
+from datetime import datetime, timedelta
+
+class TestBitmap(object):
+
+    def setup(self):
+        self.i1=Intervals([(0,10), (20,35)], 'free')
+        self.i2=Intervals([(5,25)])
+        self.i3=Intervals([(30,40)])
+
+    def test_from_intervals(self):
+        b = Bitmap.from_intervals(self.i1, 0, 5, 10)
+        assert_equal(b.bits, 0b1110011)
+        assert_equal(b.popcount(), 5)
+        assert_equal(b.get_total_time(), 25)
+
+    def test_from_intervals_partial(self):
+        i = Intervals([(3,7)])
+        assert_equal(Bitmap.from_intervals(i, 0, 5, 10).bits, 0)
+        assert_equal(Bitmap.from_intervals(i, 0, 5, 10, partial=True).bits, 0b11)
+
+    def test_clipped_to_grid(self):
+        b = Bitmap.from_intervals(self.i1, 5, 5, 4)
+        assert_equal(b.to_intervals().toTupleList(), [(5,10), (20,25)])
+
+    def test_round_trip(self):
+        b = Bitmap.from_intervals(self.i1, 0, 5, 10)
+        assert_equal(b.to_intervals('free'), self.i1)
+        assert_equal(Bitmap.from_bytes(b.to_bytes(), 0, 5, 10), b)
+
+    def test_operations(self):
+        b1 = Bitmap.from_intervals(self.i1, 0, 5, 10)
+        b2 = Bitmap.from_intervals(self.i2, 0, 5, 10)
+        assert_equal((b1 & b2).to_intervals().toTupleList(), [(5,10), (20,25)])
+        assert_equal((b1 | b2).to_intervals().toTupleList(), [(0,35)])
+        assert_equal((b1 - b2).to_intervals().toTupleList(), [(0,5), (25,35)])
+
+    def test_set_operations(self):
+        cals = [self.i1, self.i2, self.i3]
+        assert_equal(bitmap.intersect(cals, 0, 5, 10).toTupleList(), [])
+        assert_equal(bitmap.union(cals, 0, 5, 10).toTupleList(), [(0,40)])
+        assert_equal(bitmap.subtract(self.i1, [self.i2, self.i3], 0, 5, 10).toTupleList(),
+                     [(0,5), (25,30)])
+
+    def test_datetime(self):
+        i = Intervals([(datetime(2017,1,1,9,0), datetime(2017,1,1,9,20))])
+        b = Bitmap.from_intervals(i, datetime(2017,1,1), timedelta(minutes=5), 288)
+        assert_equal(b.popcount(), 4)
+        assert_equal(b.to_intervals(), i)
+
+    @raises(IntervalsError)
+    def test_different_grids(self):
+        Bitmap(0, 5, 10) & Bitmap(0, 1, 10)
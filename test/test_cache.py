@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+'''
+test_cache.py - Class for testing the memoization of operations on intervals
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import shutil
+import tempfile
+from nose.tools import assert_equal, assert_true, assert_false
+
+from time_intervals.intervals import *
+from time_intervals.cache import ResultCache
+
+class TestResultCache(object):
+
+    def setup(self):
+        self.i1=Intervals([(1,3), (4,5)], 'free')
+        self.i2=Intervals([(2,4)])
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_fingerprint(self):
+        assert_equal(self.i1.fingerprint(), Intervals([(4,5), (1,3)], 'free').fingerprint())
+        assert_true(self.i1.fingerprint() != Intervals([(1,3), (4,5)]).fingerprint())
+        assert_true(self.i1.fingerprint() != Intervals([(1.0,3), (4,5)], 'free').fingerprint())
+
+    def test_memory_hit(self):
+        cache = ResultCache()
+        r1 = cache.intersect(self.i1, [self.i2])
+        r2 = cache.intersect(Intervals([(1,3), (4,5)], 'free'), [Intervals([(2,4)])])
+        assert_true(r1 is r2)
+        assert_equal(r1, self.i1.intersect([self.i2]))
+
+    def test_operations_keyed_apart(self):
+        cache = ResultCache()
+        assert_equal(cache.union(self.i1, [self.i2]).toTupleList(), [(1,5)])
+        assert_equal(cache.subtract(self.i1, self.i2).toTupleList(), [(1,2), (4,5)])
+        assert_equal(cache.intersect(self.i1, [self.i2]).toTupleList(), [(2,3)])
+
+    def test_disk_hit_across_instances(self):
+        r1 = ResultCache(self.directory).subtract(self.i1, self.i2)
+        cache = ResultCache(self.directory)
+        key = ResultCache.key('subtract', self.i1, [self.i2])
+        assert_true(cache.get(key) is not None)
+        assert_equal(cache.subtract(self.i1, self.i2), r1)
+
+    def test_disk_datetime(self):
+        d1 = Intervals([(datetime(2017,1,1,1), datetime(2017,1,1,3))], 'busy')
+        d2 = Intervals([(datetime(2017,1,1,2), datetime(2017,1,1,4))])
+        r1 = ResultCache(self.directory).union(d1, [d2])
+        cache = ResultCache(self.directory)
+        key = ResultCache.key('union', d1, [d2])
+        assert_equal(cache.get(key), r1)
+        assert_true(os.listdir(self.directory)[0].endswith('.json'))
+
+    def test_disk_unsupported_times(self):
+        cache = ResultCache(self.directory)
+        assert_true(ResultCache.encode(Intervals([((1,), (2,))])) is None)
+        cache.union(Intervals([((1,), (2,))]), [])
+        assert_equal(os.listdir(self.directory), [])
+
+    def test_disk_eviction(self):
+        cache = ResultCache(self.directory, max_bytes=1000)
+        for n in range(50):
+            cache.union(Intervals([(n, n+1)]), [self.i2])
+        assert_true(cache.disk_bytes <= 1000)
+        assert_true(len(os.listdir(self.directory)) < 50)
+
+    def test_memory_eviction(self):
+        cache = ResultCache(max_entries=2)
+        for n in range(5):
+            cache.union(Intervals([(n, n+1)]), [self.i2])
+        assert_equal(len(cache.memory), 2)
+
+    def test_cached_operand_copy(self):
+        cache = ResultCache()
+        r = cache.subtract(self.i1, Intervals([]))
+        assert_false(r is self.i1)
+        self.i1.add([(10,11)])
+        assert_equal(r.toTupleList(), [(1,3), (4,5)])
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+'''
+test_cli.py - Class for testing the command-line batch processor
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import json
+import shutil
+import struct
+import tempfile
+from nose.tools import assert_equal, assert_true
+
+from time_intervals.__main__ import main
+
+class TestCommandLine(object):
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.a = self.write('a.csv', 'id,start,end\nh1,1,3\nh1,4,5\nh2,0,10\nh1,2,3.5\n')
+        self.b = self.write('b.ndjson', '{"id": "h1", "start": 3, "end": 6}\n'
+                                        '{"id": "h2", "start": 2, "end": 4}\n')
+        self.output = os.path.join(self.directory, 'out')
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content, mode='w'):
+        path = os.path.join(self.directory, name)
+        with open(path, mode) as f:
+            f.write(content)
+        return path
+
+    def run(self, argv):
+        main(argv + ['--output', self.output])
+        with open(self.output) as f:
+            return f.read().splitlines()
+
+    def test_union(self):
+        b = self.write('b.csv', 'h1,3,6\nh2,2,4\n')
+        assert_equal(self.run(['union', self.a, b]),
+                     ['id,start,end', 'h1,1,6', 'h2,0,10'])
+
+    def test_subtract_ndjson(self):
+        b = self.write('b2.csv', 'h1,3,6\nh2,2,4\n')
+        lines = self.run(['subtract', self.a, b, '--output-format', 'ndjson'])
+        assert_equal([json.loads(l) for l in lines],
+                     [{'id':'h1', 'start':1, 'end':3}, {'id':'h2', 'start':0, 'end':2},
+                      {'id':'h2', 'start':4, 'end':10}])
+
+    def test_intersect_ndjson(self):
+        a = self.write('a.ndjson', '{"id": "h1", "start": 1, "end": 3.5}\n'
+                                   '{"id": "h1", "start": 4, "end": 5}\n'
+                                   '{"id": "h2", "start": 0, "end": 10}\n')
+        assert_equal(self.run(['intersect', a, self.b, '--format', 'ndjson']),
+                     ['id,start,end', 'h1,3,3.5', 'h1,4,5', 'h2,2,4'])
+
+    def test_total_with_workers(self):
+        assert_equal(self.run(['total', self.a, '--workers', '2']),
+                     ['id,total', 'h1,3.5', 'h2,10'])
+
+    def test_gaps(self):
+        assert_equal(self.run(['gaps', self.a, '--start', '0', '--end', '6']),
+                     ['id,start,end', 'h1,0,1', 'h1,3.5,4', 'h1,5,6'])
+
+    def test_histogram_datetime(self):
+        path = self.write('d.csv', 'start,end\n2017-01-01T01:00:00,2017-01-01T03:30:00\n')
+        assert_equal(self.run(['histogram', path, '--origin', '2017-01-01T00:00:00',
+                               '--width', '7200', '--buckets', '2']),
+                     ['id,bucket,covered', ',2017-01-01T00:00:00,3600.0',
+                      ',2017-01-01T02:00:00,5400.0'])
+
+    def test_binary(self):
+        path = self.write('c.bin', struct.pack('<4d', 1, 2, 1.5, 4), 'wb')
+        assert_equal(self.run(['union', path, '--format', 'binary']),
+                     ['id,start,end', ',1.0,4.0'])
+
+    def bad_row(self, name, content, fmt='csv'):
+        ''' Returns the message the command line exits with on a bad file.'''
+        path = self.write(name, content)
+        try:
+            self.run(['union', path, '--format', fmt])
+        except SystemExit as e:
+            return str(e).replace(path, 'PATH')
+        raise AssertionError('SystemExit not raised')
+
+    def test_bad_row(self):
+        assert_equal(self.bad_row('bad.csv', 'h1,1,3\nh1,5,4\n'),
+                     'PATH, row 2: interval ends before it starts')
+
+    def test_bad_ndjson(self):
+        assert_true(self.bad_row('bad.ndjson', '{"start": 1, "end": 2}\n{"start": 1,\n',
+                                 'ndjson').startswith('PATH, row 2: '))
+        assert_equal(self.bad_row('bad2.ndjson', '{"start": 1}\n', 'ndjson'),
+                     'PATH, row 1: missing start or end')
+
+    def test_mixed_time_types(self):
+        assert_true(self.bad_row('mixed.csv', '1,3\n2017-01-01T00:00:00,2017-01-02T00:00:00\n')
+                    .startswith('PATH, row 2: '))
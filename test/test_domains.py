@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+'''
+test_domains.py - Class for testing intervals over various time domains
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from decimal import Decimal
+from nose.tools import assert_equal, assert_true
+
+from time_intervals.intervals import *
+from time_intervals.domains import TimeDomain, register_domain, get_domain, DOMAINS, GENERIC
+from datetime import date, datetime, timedelta, timezone
+
+class Tick(object):
+    ''' A time type Intervals knows nothing about.'''
+    def __init__(self, n):
+        self.n = n
+    def __sub__(self, other):
+        return self.n - other.n
+    def __lt__(self, other):
+        return self.n < other.n
+    def __le__(self, other):
+        return self.n <= other.n
+    def __eq__(self, other):
+        return self.n == other.n
+
+class TestDomains(object):
+
+    def teardown(self):
+        DOMAINS.pop(Tick, None)
+
+    def test_date(self):
+        i = Intervals([(date(2017,1,5), date(2017,1,8)), (date(2017,1,1), date(2017,1,3))])
+        assert_equal(i.toTupleList()[0], (date(2017,1,1), date(2017,1,3)))
+        assert_equal(i.get_total_time(), timedelta(days=5))
+        i.trim_to_time(timedelta(days=3))
+        assert_equal(i.toTupleList()[-1], (date(2017,1,5), date(2017,1,6)))
+
+    def test_decimal(self):
+        i = Intervals([(Decimal('1.5'), Decimal('2.25'))])
+        assert_equal(i.get_total_time(), Decimal('0.75'))
+
+    def test_aware_datetime(self):
+        tz = timezone(timedelta(hours=2))
+        i = Intervals([(datetime(2017,1,1,4, tzinfo=tz), datetime(2017,1,1,5, tzinfo=tz)),
+                       (datetime(2017,1,1,1, tzinfo=timezone.utc), datetime(2017,1,1,2, tzinfo=timezone.utc))])
+        assert_equal(i.toTupleList(), [(datetime(2017,1,1,1, tzinfo=timezone.utc),
+                                        datetime(2017,1,1,5, tzinfo=tz))])
+        assert_equal(i.get_total_time(), timedelta(hours=2))
+
+    def test_unregistered_type(self):
+        assert_true(get_domain(Tick(1)) is GENERIC)
+        i = Intervals([(Tick(1), Tick(3)), (Tick(4), Tick(5))])
+        assert_equal(i.get_total_time(), 3)
+
+    def test_registered_type(self):
+        register_domain(Tick, TimeDomain(0, lambda t: t.n))
+        i = Intervals([(Tick(4), Tick(5)), (Tick(1), Tick(3))])
+        assert_equal(i.toTupleList()[0][0].n, 1)
+        assert_equal(i.get_total_time(), 3)
@@ -19,7 +19,7 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
-from nose.tools import assert_equal
+from nose.tools import assert_equal, raises
 
 from time_intervals.intervals import *
 
@@ -104,3 +104,48 @@ class TestIntervalsTupleDatetime(object):
         self.i4.add([{'time':datetime(2017,1,1,5,0,0), 'type':'start'}, {'time':datetime(2017,1,1,6,0,0), 'type':'end'}])
         assert_equal(self.i4.timepoints[3]['time'], datetime(2017,1,1,7,0,0))
         assert_equal(self.i4.timepoints[3]['type'], 'end')
+
+
+    def test_gaps(self):
+        gaps = self.i1.gaps(datetime(2017,1,1,2,0,0), datetime(2017,1,1,6,0,0))
+        assert_equal(list(gaps), [(datetime(2017,1,1,3,0,0), datetime(2017,1,1,4,0,0)),
+                                  (datetime(2017,1,1,5,0,0), datetime(2017,1,1,6,0,0))])
+
+
+    def test_allocate(self):
+        (placements, remaining) = self.i1.allocate([timedelta(hours=1), timedelta(hours=1)],
+                                                   policy='best_fit')
+        assert_equal(placements, [(datetime(2017,1,1,4,0,0), datetime(2017,1,1,5,0,0)),
+                                  (datetime(2017,1,1,1,0,0), datetime(2017,1,1,2,0,0))])
+        assert_equal(remaining.toTupleList(), [(datetime(2017,1,1,2,0,0), datetime(2017,1,1,3,0,0))])
+
+
+    @raises(IntervalsError)
+    def test_export_buffers(self):
+        self.i1.export_buffers()
+
+
+    def test_histogram(self):
+        h = self.i1.histogram(datetime(2017,1,1,0,30,0), timedelta(hours=2), 3)
+        assert_equal(h, [timedelta(hours=1, minutes=30), timedelta(hours=1),
+                         timedelta(minutes=30)])
+
+
+    def test_calendar_histogram(self):
+        i = Intervals([(datetime(2017,1,1,22,0,0), datetime(2017,1,2,3,0,0))])
+        h = i.calendar_histogram(datetime(2017,1,1,12,0,0), 2)
+        assert_equal(h, [(datetime(2017,1,1), timedelta(hours=2)),
+                         (datetime(2017,1,2), timedelta(hours=3))])
+        h = i.calendar_histogram(datetime(2017,1,4), 1, period='week')
+        assert_equal(h, [(datetime(2017,1,2), timedelta(hours=3))])
+
+
+    def test_contains_many(self):
+        times = [datetime(2017,1,1,2,0,0), datetime(2017,1,1,3,0,0), datetime(2017,1,1,4,30,0)]
+        assert_equal(self.i1.contains_many(times), [True, False, True])
+
+
+    def test_earliest_common_slot(self):
+        slot = Intervals.earliest_common_slot([self.i1, self.i4], timedelta(hours=1),
+                                              datetime(2017,1,1,2,30,0))
+        assert_equal(slot, datetime(2017,1,1,4,0,0))
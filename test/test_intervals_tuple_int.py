@@ -19,7 +19,8 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
-from nose.tools import assert_equal
+from nose.tools import assert_equal, assert_true, raises
+from unittest import SkipTest
 
 from time_intervals.intervals import *
 
@@ -87,3 +88,460 @@ class TestIntervalsTupleInt(object):
         self.i4.add([(5,6)])
         assert_equal(self.i4.timepoints[3]['time'], 7)
         assert_equal(self.i4.timepoints[3]['type'], 'end')
+
+
+    def test_gaps(self):
+        assert_equal(list(self.i4.gaps(0, 10)), [(0,1), (3,4), (5,6), (7,10)])
+
+
+    def test_gaps_window_inside_interval(self):
+        assert_equal(list(self.i4.gaps(2, 6)), [(3,4), (5,6)])
+        assert_equal(list(self.i4.gaps(3, 5)), [(3,4)])
+        assert_equal(list(self.i4.gaps(4, 5)), [])
+
+
+    def test_gaps_does_not_alter(self):
+        list(self.i1.gaps(0, 10))
+        assert_equal(self.i1.toTupleList(), [(1,3), (4,5)])
+        assert_equal(self.i1.label, 'free')
+
+
+    def test_gaps_empty(self):
+        assert_equal(list(self.i8.gaps(0, 10)), [(0,10)])
+        assert_equal(list(self.i8.gaps(10, 0)), [])
+
+
+    def test_allocate_first_fit(self):
+        (placements, remaining) = self.i4.allocate([1, 1, 2, 5])
+        assert_equal(placements, [(1,2), (2,3), None, None])
+        assert_equal(remaining.toTupleList(), [(4,5), (6,7)])
+        assert_equal(remaining.label, 'free')
+        assert_equal(self.i4.toTupleList(), [(1,3), (4,5), (6,7)])
+
+
+    def test_allocate_best_fit(self):
+        (placements, remaining) = self.i4.allocate([1, 2, 1], policy='best_fit')
+        assert_equal(placements, [(4,5), (1,3), (6,7)])
+        assert_equal(remaining.toTupleList(), [])
+
+
+    def test_allocate_earliest(self):
+        (placements, remaining) = self.i4.allocate([1, 1], earliest=2)
+        assert_equal(placements, [(2,3), (4,5)])
+        assert_equal(remaining.toTupleList(), [(1,2), (6,7)])
+
+
+    def test_diff(self):
+        (added, removed) = self.i1.diff(Intervals([(2,4), (6,7)]))
+        assert_equal(added.toTupleList(), [(3,4), (6,7)])
+        assert_equal(removed.toTupleList(), [(1,2), (4,5)])
+
+
+    def test_diff_identical(self):
+        (added, removed) = self.i4.diff(Intervals([(1,3), (4,5), (6,7)]))
+        assert_true(added.is_empty())
+        assert_true(removed.is_empty())
+
+
+    def test_observer(self):
+        changes = []
+        self.i4.add_observer(lambda i, start, end: changes.append((start, end)))
+        self.i4.add([(8,9), (10,12)])
+        self.i4.remove_intervals_smaller_than(2)
+        self.i4.trim_to_time(3)
+        self.i4.complement(0, 20)
+        assert_equal(changes, [(8,12), (4,9), (11,12), (0,20)])
+
+
+    def test_observer_merge_gap(self):
+        changes = []
+        i = Intervals([(1,3), (10,11)], merge_gap=2)
+        i.add_observer(lambda i, start, end: changes.append((start, end)))
+        i.add([(5,6)])
+        assert_equal(i.toTupleList(), [(1,6), (10,11)])
+        assert_equal(changes, [(1,6)])
+
+
+    def test_append_observer_merge_gap(self):
+        changes = []
+        i = Intervals([(1,3)], merge_gap=2)
+        i.add_observer(lambda i, start, end: changes.append((start, end)))
+        i.append(5, 6)
+        i.append(6, 7)
+        assert_equal(i.toTupleList(), [(1,7)])
+        assert_equal(changes, [(3,6), (6,7)])
+
+
+    def test_iter_intervals(self):
+        assert_equal(list(self.i4.iter_intervals()), [(1,3), (4,5), (6,7)])
+
+
+    def test_view(self):
+        v = self.i4.view()
+        assert_equal(len(v), 3)
+        assert_equal(v[1], (4,5))
+        assert_equal(v[-1], (6,7))
+        assert_equal(list(v[1:]), [(4,5), (6,7)])
+        assert_equal(list(v[::2]), [(1,3), (6,7)])
+        assert_equal(len(self.i8.view()), 0)
+
+
+    def test_view_follows_writes(self):
+        v = self.i4.view()
+        self.i4.add([(8,9)])
+        assert_equal(list(v), [(1,3), (4,5), (6,7), (8,9)])
+
+
+    def test_export_buffers(self):
+        (starts, ends) = self.i4.export_buffers()
+        assert_equal(starts.format, 'q')
+        assert_equal(starts.tolist(), [1, 4, 6])
+        assert_equal(ends.tolist(), [3, 5, 7])
+        assert_true(starts.readonly)
+        (starts, ends) = Intervals([(1.5, 2)]).export_buffers()
+        assert_equal(starts.format, 'd')
+        assert_equal(ends.tolist(), [2.0])
+
+
+    def test_merge_gap(self):
+        i = Intervals([(1,3), (4,5), (7,8), (20,21)], merge_gap=2)
+        assert_equal(i.toTupleList(), [(1,8), (20,21)])
+        i.add([(22,23)])
+        assert_equal(i.toTupleList(), [(1,8), (20,23)])
+
+
+    def test_min_length(self):
+        i = Intervals([(1,3), (4,5), (6,9)], min_length=2)
+        assert_equal(i.toTupleList(), [(1,3), (6,9)])
+        i.add([(10,11)])
+        assert_equal(i.toTupleList(), [(1,3), (6,9)])
+
+
+    def test_merge_gap_before_min_length(self):
+        i = Intervals([(1,2), (3,4), (10,11)], merge_gap=1, min_length=2)
+        assert_equal(i.toTupleList(), [(1,4)])
+
+
+    def test_remove_intervals_smaller_than(self):
+        self.i4.remove_intervals_smaller_than(2)
+        assert_equal(self.i4.toTupleList(), [(1,3)])
+
+
+    def test_horizon(self):
+        i = Intervals([(1,3), (4,5), (6,10)], horizon=5)
+        assert_equal(i.toTupleList(), [(6,10)])
+        i.add([(11,12)])
+        assert_equal(i.toTupleList(), [(7,10), (11,12)])
+        assert_equal(i.get_total_time(), 4)
+
+
+    def test_expire(self):
+        i = Intervals([(1,3), (4,5), (6,10)], horizon=5)
+        i.expire(now=14)
+        assert_equal(i.toTupleList(), [(9,10)])
+        i.expire(now=20)
+        assert_true(i.is_empty())
+
+
+    def test_expire_stream(self):
+        i = Intervals([], horizon=20)
+        for k in range(100):
+            i.append(3*k, 3*k+2)
+            # evicted timepoints are compacted away before they outgrow
+            # the live ones
+            assert_true(len(i.store) <= 2 * (len(i.store) - i.head) + 2)
+        assert_equal(i.toTupleList()[0], (279,281))
+        assert_equal(len(i.timepoints), 14)
+
+
+    def test_append_horizon_overlap(self):
+        i = Intervals([], horizon=5)
+        i.append(0, 20)
+        i.append(10, 25)
+        assert_equal(i.toTupleList(), [(20,25)])
+        i.append(1, 2)
+        assert_equal(i.toTupleList(), [(20,25)])
+        i.append(26, 28)
+        raises(IntervalsError)(i.append)(24, 30)
+
+
+    def test_expire_without_horizon(self):
+        self.i4.expire(now=100)
+        assert_equal(self.i4.toTupleList(), [(1,3), (4,5), (6,7)])
+
+
+    def test_append(self):
+        self.i4.append(7, 8)
+        self.i4.append(8, 9)
+        self.i4.append(8, 8)
+        self.i4.append(10, 11)
+        self.i4.append(10, 12)
+        assert_equal(self.i4.toTupleList(), [(1,3), (4,5), (6,9), (10,12)])
+        self.i8.append(1, 2)
+        assert_equal(self.i8.toTupleList(), [(1,2)])
+
+
+    @raises(IntervalsError)
+    def test_append_out_of_order(self):
+        self.i4.append(5, 8)
+
+
+    def test_extend_sorted(self):
+        i = Intervals([], merge_gap=1, min_length=2)
+        i.extend_sorted([(1,2), (3,4), (10,11), (20,25), (25,26)])
+        assert_equal(i.toTupleList(), [(1,4), (20,26)])
+
+
+    def test_extend_sorted_partial(self):
+        try:
+            self.i1.extend_sorted([(6,7), (2,3)])
+        except IntervalsError:
+            pass
+        assert_equal(self.i1.toTupleList(), [(1,3), (4,5), (6,7)])
+
+
+    def test_histogram(self):
+        assert_equal(self.i4.histogram(0, 2, 4), [1, 1, 1, 1])
+        assert_equal(self.i4.histogram(2, 3, 3), [2, 1, 0])
+        assert_equal(self.i4.histogram(10, 3, 2), [0, 0])
+        assert_equal(self.i8.histogram(0, 2, 2), [0, 0])
+
+
+    def test_histogram_float(self):
+        i = Intervals([(0.5, 2.0), (3.0, 3.25)])
+        assert_equal(i.histogram(0, 1, 4), [0.5, 1.0, 0.0, 0.25])
+
+
+    def test_contains_many(self):
+        times = [0, 1, 2, 3, 4, 5, 6.5, 7, 9]
+        expected = [False, True, True, False, True, False, True, False, False]
+        assert_equal(self.i4.contains_many(times), expected)
+        assert_equal(self.i4.contains_many(times, assume_sorted=True), expected)
+        assert_equal(self.i4.contains_many(list(reversed(times))), list(reversed(expected)))
+        assert_equal(self.i8.contains_many([1, 2]), [False, False])
+
+
+    def test_contains_many_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            raise SkipTest('numpy is not installed')
+        mask = self.i4.contains_many(numpy.array([0, 1, 3, 6.5]))
+        assert_equal(mask.tolist(), [False, True, False, True])
+
+
+    def test_subtract_list(self):
+        i = Intervals([(0,20)], 'free').subtract([Intervals([(1,3), (10,12)], 'free'),
+                                                  Intervals([(2,5), (11,15)]),
+                                                  Intervals([])])
+        assert_equal(i.toTupleList(), [(0,1), (5,10), (15,20)])
+        assert_equal(i.label, None)
+
+
+    def test_subtract_list_same_label(self):
+        i = self.i4.subtract([Intervals([(2,4)], 'free'), Intervals([(6,7)], 'free')])
+        assert_equal(i.toTupleList(), [(1,2), (4,5)])
+        assert_equal(i.label, 'free')
+
+
+    def test_subtract_self(self):
+        assert_true(self.i4.subtract(self.i4).is_empty())
+        assert_true(self.i4.subtract([self.i4, self.i4]).is_empty())
+
+
+    def test_subtract_does_not_alter_operands(self):
+        other = Intervals([(2,4)])
+        self.i4.subtract(other)
+        assert_equal(other.toDictList(), [{'time':2, 'type':'start'}, {'time':4, 'type':'end'}])
+
+
+    def test_sort_timepoints(self):
+        tps = [{'time':3, 'type':'start'}, {'time':1, 'type':'start'},
+               {'time':3, 'type':'end'}, {'time':1.5, 'type':'end'}]
+        expected = [{'time':1, 'type':'start'}, {'time':1.5, 'type':'end'},
+                    {'time':3, 'type':'end'}, {'time':3, 'type':'start'}]
+        Intervals.sort_timepoints(tps)
+        assert_equal(tps, expected)
+
+
+    def test_sort_timepoints_counting(self):
+        tps = [{'time':5, 'type':'end'}, {'time':3, 'type':'start'},
+               {'time':1, 'type':'start'}, {'time':3, 'type':'end'}]
+        Intervals.sort_timepoints(tps, 'counting')
+        assert_equal(tps, [{'time':1, 'type':'start'}, {'time':3, 'type':'end'},
+                           {'time':3, 'type':'start'}, {'time':5, 'type':'end'}])
+
+
+    def test_sort_timepoints_counting_wide_span(self):
+        tps = [{'time':1500000000, 'type':'end'}, {'time':0, 'type':'start'}]
+        assert_true(not Intervals.counting_sort(tps))
+        Intervals.sort_timepoints(tps, 'counting')
+        assert_equal(tps, [{'time':0, 'type':'start'}, {'time':1500000000, 'type':'end'}])
+
+
+    def test_intersect_disjoint_spans(self):
+        i = self.i4.intersect([Intervals([(10,20)]), Intervals([(1,2)])])
+        assert_true(i.is_empty())
+
+
+    def test_intersect_paranoid_operand(self):
+        o = Intervals([(6,8)], paranoid=True)
+        o.timepoints.extend([{'time':1, 'type':'start'}, {'time':2, 'type':'end'}])
+        i = Intervals([(0,10)]).intersect([o])
+        assert_equal(i.toTupleList(), [(1,2), (6,8)])
+
+
+    def test_intersect_many(self):
+        i = self.i4.intersect([Intervals([(0,100)]), Intervals([(2,6.5)]), Intervals([(2.5,4.5)])])
+        assert_equal(i.toTupleList(), [(2.5,3), (4,4.5)])
+        assert_equal(i.label, 'free')
+
+
+    def test_clip_timepoints(self):
+        tps = self.i4.toDictList()
+        assert_equal(Intervals.clip_timepoints(tps, 2, 4), tps[0:4])
+        assert_equal(Intervals.clip_timepoints(tps, 3, 3.5), [])
+        assert_equal(Intervals.clip_timepoints(tps, 5.5, 10), tps[4:6])
+
+
+    def test_freeze(self):
+        i = Intervals([(1,2)]).freeze()
+        assert_true(i.frozen)
+        raises(IntervalsError)(i.add)([(3,4)])
+        raises(IntervalsError)(i.append)(3, 4)
+        raises(IntervalsError)(i.trim_to_time)(1)
+        assert_equal(i.toTupleList(), [(1,2)])
+
+
+    def test_intern(self):
+        pool = InternPool()
+        a = Intervals([(1,2), (3,4)])
+        b = Intervals([(3,4), (1,2)])
+        shared = pool.intern(a)
+        assert_true(shared is not a)
+        assert_true(shared.frozen)
+        assert_true(not a.frozen)
+        assert_true(pool.intern(b) is shared)
+        other = pool.intern(Intervals([(1,2), (3,4)], 'free'))
+        assert_true(other is not shared)
+        assert_equal(len(pool), 2)
+
+
+    def test_frozen_is_read_only(self):
+        i = Intervals([(1,2)]).freeze()
+        i.toDictList().append({'time':3, 'type':'start'})
+        i.toDictList()[0]['time'] = 0
+        assert_equal(i.toTupleList(), [(1,2)])
+        raises(IntervalsError)(i.add_observer)(lambda i, start, end: None)
+        raises(IntervalsError)(i.sort)()
+
+
+    def test_intern_settings(self):
+        pool = InternPool()
+        a = pool.intern(Intervals([(1,2)]))
+        b = pool.intern(Intervals([(1,2)], paranoid=True))
+        assert_true(a is not b)
+        assert_true(pool.intern(Intervals([(1,2)])) is a)
+        assert_true(pool.intern(Intervals([(1,2)], paranoid=True)) is b)
+
+
+    def test_intern_weak(self):
+        pool = InternPool()
+        pool.intern(Intervals([(1,2)]))
+        import gc
+        gc.collect()
+        assert_equal(len(pool), 0)
+
+
+    def test_union_intersect_intern(self):
+        u1 = self.i1.union([self.i4], intern=True)
+        u2 = self.i4.union([self.i1], intern=True)
+        assert_true(u1 is u2)
+        assert_equal(u1, self.i1.union([self.i4]))
+        i1 = self.i4.intersect([self.i1], intern=True)
+        assert_true(i1.frozen)
+        assert_true(i1 is self.i4.intersect([self.i1], intern=True))
+
+
+    def test_earliest_common_slot(self):
+        a = Intervals([(0,2), (3,10), (12,20)])
+        b = Intervals([(1,4), (5,8), (9,15)])
+        assert_equal(Intervals.earliest_common_slot([a, b], 1, 0), 1)
+        assert_equal(Intervals.earliest_common_slot([a, b], 3, 0), 5)
+        assert_equal(Intervals.earliest_common_slot([a, b], 3, 6), 12)
+        assert_equal(Intervals.earliest_common_slot([a, b], 3, 0, before=7), -1)
+        assert_equal(Intervals.earliest_common_slot([a, b], 4, 0), -1)
+        assert_equal(Intervals.earliest_common_slot([a, self.i8], 1, 0), -1)
+
+
+    def test_batch(self):
+        i = Intervals([(1,3)])
+        calls = []
+        i.add_observer(lambda intervals, start, end: calls.append((start, end)))
+        with i.batch():
+            i.add([(5,6)])
+            i.append(8, 9)
+            i.add([(2,4)])
+            # reads see the intervals as they were before the batch
+            assert_equal(i.toTupleList(), [(1,3)])
+            i.remove_intervals_smaller_than(2)
+        assert_equal(i.toTupleList(), [(1,4)])
+        assert_equal(calls, [(2,9)])
+
+
+    def test_batch_same_as_unbatched(self):
+        i = Intervals([(0,10), (20,30)])
+        j = Intervals([(0,10), (20,30)])
+        with i.batch():
+            i.add([(12,14)])
+            i.trim_to_time(15)
+            i.add([(30,31)])
+            i.complement(0, 40)
+        j.add([(12,14)])
+        j.trim_to_time(15)
+        j.add([(30,31)])
+        j.complement(0, 40)
+        assert_equal(i, j)
+
+
+    def test_batch_expire_from_empty(self):
+        i = Intervals([], horizon=5)
+        with i.batch():
+            i.add([(0,3), (10,20)])
+            i.expire(now=100)
+        assert_true(i.is_empty())
+
+
+    def test_batch_exception(self):
+        i = Intervals([(1,3)])
+        try:
+            with i.batch():
+                i.add([(5,6)])
+                with i.batch():
+                    i.add([(7,8)])
+                raise ValueError()
+        except ValueError:
+            pass
+        assert_equal(i.toTupleList(), [(1,3)])
+
+        def trim_too_much():
+            with i.batch():
+                i.add([(5,6)])
+                i.trim_to_time(10)
+        raises(IntervalsError)(trim_too_much)()
+        # replaying failed: nothing was applied
+        assert_equal(i.toTupleList(), [(1,3)])
+
+
+    def test_map_op(self):
+        calendars = [Intervals([(k,k+3)]) for k in range(10)]
+        window = Intervals([(2,6)])
+        expected = [c.intersect([window]).get_total_time() for c in calendars]
+        for executor in (None, 'thread', 'process'):
+            results = Intervals.map_op(calendars, 'intersect', ([window],),
+                                       executor=executor, max_workers=2, chunksize=3)
+            assert_equal([r.get_total_time() for r in results], expected)
+        assert_equal(Intervals.map_op(calendars, 'get_total_time', executor='thread'),
+                     [3] * 10)
+        raises(IntervalsError)(Intervals.map_op)(calendars, 'get_total_time',
+                                                 executor='fibers')
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+'''
+test_join.py - Class for testing the overlap join of interval collections
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from nose.tools import assert_equal, raises
+
+from time_intervals.intervals import *
+from time_intervals.join import overlap_join
+
+class TestOverlapJoin(object):
+
+    def setup(self):
+        self.bookings  = {'b1':(1,4), 'b2':(5,6), 'b3':(10,12)}
+        self.resources = [('r1', Intervals([(0,2), (3,5)])),
+                          ('r2', Intervals([(4,11)]))]
+
+    def test_join(self):
+        pairs = sorted(overlap_join(self.bookings, self.resources))
+        assert_equal(pairs, [('b1', 'r1', (1,2)), ('b1', 'r1', (3,4)),
+                             ('b2', 'r2', (5,6)), ('b3', 'r2', (10,11))])
+
+    def test_touching_intervals_do_not_overlap(self):
+        assert_equal(overlap_join({'a':(1,2)}, {'b':(2,3)}), [])
+
+    def test_matches_intersect(self):
+        left  = {'x':Intervals([(0,3), (5,9)]), 'y':Intervals([(2,6)])}
+        right = {'z':Intervals([(1,2), (4,7), (8,20)])}
+        for lkey in left:
+            expected = left[lkey].intersect([right['z']]).toTupleList()
+            found = sorted(o for (l, r, o) in overlap_join(left, right) if l == lkey)
+            assert_equal(found, expected)
+
+    def test_empty(self):
+        assert_equal(overlap_join({}, self.resources), [])
+
+    @raises(IntervalsError)
+    def test_bad_value(self):
+        overlap_join({'a':[1, 2]}, {})
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+'''
+test_recurring.py - Class for testing lazily generated recurring intervals
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from nose.tools import assert_equal, raises
+
+from time_intervals.intervals import *
+from time_intervals.recurring import RecurringIntervals
+from datetime import datetime, timedelta
+
+class TestRecurringIntervals(object):
+
+    def setup(self):
+        # Mon-Fri 9:00-17:00, 2017-01-02 is a Monday
+        self.business_hours = RecurringIntervals(datetime(2017,1,2), timedelta(weeks=1),
+                                                 [timedelta(days=d, hours=9) for d in range(5)],
+                                                 timedelta(hours=8),
+                                                 exceptions=[datetime(2017,1,4,9)],
+                                                 label='free')
+        # every 10: 2-4 and 6-7
+        self.pattern = RecurringIntervals(0, 10, [6, 2], [1, 2], until=25)
+
+    def test_occurrences(self):
+        assert_equal(list(self.pattern.occurrences(0, 100)),
+                     [(2,4), (6,7), (12,14), (16,17), (22,24)])
+        assert_equal(list(self.pattern.occurrences(3, 13)), [(2,4), (6,7), (12,14)])
+
+    def test_exceptions(self):
+        week = self.business_hours.to_intervals(datetime(2017,1,2), datetime(2017,1,9))
+        assert_equal(len(week.toTupleList()), 4)
+        assert_equal(week.get_total_time(), timedelta(hours=32))
+
+    def test_to_intervals_clips(self):
+        assert_equal(self.pattern.to_intervals(3, 13).toTupleList(), [(3,4), (6,7), (12,13)])
+
+    def test_intersect(self):
+        bookings = Intervals([(datetime(2017,1,3,8), datetime(2017,1,3,10)),
+                              (datetime(2017,1,4,12), datetime(2017,1,4,13)),
+                              (datetime(2021,6,4,16), datetime(2021,6,5,16))])
+        i = bookings.intersect([self.business_hours])
+        assert_equal(i.toTupleList(), [(datetime(2017,1,3,9), datetime(2017,1,3,10)),
+                                       (datetime(2021,6,4,16), datetime(2021,6,4,17))])
+
+    def test_subtract(self):
+        i = Intervals([(0,30)]).subtract(self.pattern)
+        assert_equal(i.toTupleList(), [(0,2), (4,6), (7,12), (14,16), (17,22), (24,30)])
+
+    def test_union(self):
+        i = Intervals([(0,1), (9,13)]).union([self.pattern])
+        assert_equal(i.toTupleList(), [(0,1), (2,4), (6,7), (9,13)])
+
+    @raises(IntervalsConstructionError)
+    def test_mismatched_durations(self):
+        RecurringIntervals(0, 10, [1, 2], [1])
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+'''
+test_shared.py - Class for testing intervals held in shared memory
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import sys
+import pickle
+import tempfile
+import subprocess
+import time_intervals
+from multiprocessing import Pool
+from nose.tools import assert_equal, assert_true, raises
+
+from time_intervals.intervals import *
+from time_intervals.shared import SharedIntervals
+from datetime import datetime, timedelta
+
+def total_time(shared):
+    return shared.get_total_time()
+
+# run in a fresh interpreter, so that its resource tracker's output can be
+# checked: a pool started inside a child attaches from grandchildren
+NESTED = '''
+import sys
+import multiprocessing as mp
+sys.path.insert(0, %r)
+from time_intervals.intervals import Intervals
+from time_intervals.shared import SharedIntervals
+
+def total_time(shared):
+    return shared.get_total_time()
+
+def nested(shared):
+    with mp.get_context('spawn').Pool(1) as pool:
+        print(pool.map(total_time, [shared])[0])
+
+if __name__ == '__main__':
+    shared = SharedIntervals.create(Intervals([(1,3)]))
+    child = mp.get_context('spawn').Process(target=nested, args=(shared,))
+    child.start()
+    child.join()
+    shared.unlink()
+'''
+
+class TestSharedIntervals(object):
+
+    def setup(self):
+        self.i1=Intervals([(1,3), (4,5), (6,10)], 'free')
+        self.i2=Intervals([(datetime(2017,1,1,1), datetime(2017,1,1,3)),
+                           (datetime(2017,1,1,4), datetime(2017,1,1,5))])
+        self.shared = SharedIntervals.create(self.i1)
+
+    def teardown(self):
+        self.shared.unlink()
+
+    def test_round_trip(self):
+        assert_equal(self.shared.to_intervals(), self.i1)
+        assert_equal(len(self.shared), 3)
+
+    def test_reads(self):
+        assert_equal(self.shared.get_total_time(), 7)
+        assert_equal(self.shared.find_interval_of_length(3), 6)
+        assert_equal(self.shared.find_interval_of_length(5), -1)
+        assert_equal(self.shared.to_intervals(4, 7).toTupleList(), [(4,5), (6,10)])
+
+    def test_intersect(self):
+        i = self.shared.intersect([Intervals([(2,4.5)])])
+        assert_equal(i.toTupleList(), [(2,3), (4,4.5)])
+        assert_true(self.shared.intersect([Intervals([])]).is_empty())
+
+    def test_attach(self):
+        other = pickle.loads(pickle.dumps(self.shared))
+        assert_equal(other.to_intervals(), self.i1)
+        other.close()
+
+    def test_pool(self):
+        pool = Pool(2)
+        try:
+            assert_equal(pool.map(total_time, [self.shared] * 4), [7] * 4)
+        finally:
+            pool.close()
+            pool.join()
+
+    def test_nested_processes(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(time_intervals.__file__)))
+        # spawned processes re-import the main module, so it must be a file
+        (fd, path) = tempfile.mkstemp(suffix='.py')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(NESTED % root)
+            run = subprocess.run([sys.executable, path],
+                                 capture_output=True, universal_newlines=True)
+        finally:
+            os.remove(path)
+        assert_equal(run.stdout, '2\n')
+        assert_equal(run.stderr, '')
+
+    def test_datetime(self):
+        shared = SharedIntervals.create(self.i2)
+        try:
+            assert_equal(shared.to_intervals(), self.i2)
+            assert_equal(shared.get_total_time(), timedelta(hours=3))
+            assert_equal(shared.find_interval_of_length(timedelta(hours=2)),
+                         datetime(2017,1,1,1))
+        finally:
+            shared.unlink()
+
+    def test_empty(self):
+        shared = SharedIntervals.create(Intervals([]))
+        try:
+            assert_true(shared.is_empty())
+            assert_equal(shared.get_total_time(), 0)
+        finally:
+            shared.unlink()
+
+    @raises(IntervalsError)
+    def test_unsupported_times(self):
+        SharedIntervals.create(Intervals([('a', 'b')]))
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+
+'''
+__main__.py - Command-line batch processor for interval files.
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Usage: python -m time_intervals [options] COMMAND FILE [FILE...]
+
+Every input file holds one or more calendars, told apart by an id:
+* csv: rows of id,start,end or start,end (a header row is skipped),
+* ndjson: one {"id": ..., "start": ..., "end": ...} object per line, id
+being optional,
+* binary: packed little-endian (start, end) pairs of doubles, or of 64-bit
+ints with --binary-type q, all in one calendar.
+Files are read one row at a time. Calendars with the same id in different
+files are combined by the command, and each id is processed independently,
+in parallel with --workers.
+'''
+
+import sys
+import csv
+import json
+import time
+import struct
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+from time_intervals.intervals import Intervals, IntervalsError
+
+COMMANDS = ['union', 'intersect', 'subtract', 'total', 'gaps', 'histogram']
+
+def parse_time(value, time_type):
+    ''' Converts a field read from a file to a time.'''
+    if not isinstance(value, str):
+        return value
+    if time_type == 'int':
+        return int(value)
+    if time_type == 'float':
+        return float(value)
+    if time_type == 'datetime':
+        return datetime.fromisoformat(value)
+    for convert in (int, float, datetime.fromisoformat):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    raise IntervalsError('Cannot parse time: %s' % value)
+
+def parse_duration(value, time_type):
+    ''' Durations are given in seconds for datetime calendars.'''
+    if time_type == 'datetime':
+        return timedelta(seconds=float(value))
+    return parse_time(value, time_type)
+
+def format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return value
+
+def read_rows(path, fmt, binary_type):
+    ''' Generator yielding (row number, raw row) from an input file, one
+    row at a time, raw rows being decoded by decode_row(). Rows are
+    numbered from 1: lines for csv and ndjson, records for binary.'''
+    if fmt == 'binary':
+        record = struct.Struct('<2' + binary_type)
+        with open(path, 'rb') as f:
+            n = 0
+            while True:
+                data = f.read(record.size)
+                if len(data) < record.size:
+                    return
+                n += 1
+                yield (n, record.unpack(data))
+    with open(path) as f:
+        if fmt == 'ndjson':
+            for (n, line) in enumerate(f, 1):
+                if line.strip():
+                    yield (n, line)
+        else:
+            reader = csv.reader(f)
+            for row in reader:
+                if not row:
+                    continue
+                if reader.line_num == 1 and row[-1].strip().lower() == 'end':
+                    continue # header
+                yield (reader.line_num, row)
+
+def decode_row(raw, fmt):
+    ''' Returns the (id, start, end) of a raw row from read_rows().'''
+    if fmt == 'binary':
+        return ('',) + raw
+    if fmt == 'ndjson':
+        row = json.loads(raw)
+        if 'start' not in row or 'end' not in row:
+            raise ValueError('missing start or end')
+        return (str(row.get('id', '')), row['start'], row['end'])
+    if len(raw) == 2:
+        return ('', raw[0], raw[1])
+    if len(raw) == 3:
+        return (raw[0], raw[1], raw[2])
+    raise ValueError('expected 2 or 3 fields, got %d' % len(raw))
+
+def load(path, fmt, time_type, binary_type):
+    ''' Reads a file into a dict of id -> Intervals. Rows arriving in time
+    order are appended as they are read; the rest are added in one go at
+    the end. Bad rows stop the program with a message naming them.'''
+    calendars = {}
+    pending   = {}
+    for (n, raw) in read_rows(path, fmt, binary_type):
+        try:
+            (cid, start, end) = decode_row(raw, fmt)
+            start = parse_time(start, time_type)
+            end   = parse_time(end, time_type)
+            if end < start:
+                raise ValueError('interval ends before it starts')
+            if cid not in calendars:
+                calendars[cid] = Intervals([])
+                pending[cid]   = []
+            try:
+                calendars[cid].append(start, end)
+            except IntervalsError:
+                pending[cid].append((start, end))
+        except (IntervalsError, ValueError, TypeError) as e:
+            # TypeError: times of different types, e.g. int and datetime
+            raise SystemExit('%s, row %d: %s' % (path, n, e))
+    for cid in calendars:
+        try:
+            calendars[cid].add(pending[cid])
+        except TypeError as e:
+            raise SystemExit('%s: %s' % (path, e))
+    return calendars
+
+def run(task):
+    ''' Runs the command on the calendars of one id; module level so that
+    worker processes can unpickle it.'''
+    (command, cid, calendars, params) = task
+    first = calendars[0]
+    if command == 'union':
+        return [(cid,) + t for t in first.union(calendars[1:]).toTupleList()]
+    if command == 'intersect':
+        return [(cid,) + t for t in first.intersect(calendars[1:]).toTupleList()]
+    if command == 'subtract':
+        return [(cid,) + t for t in first.subtract(calendars[1:]).toTupleList()]
+    merged = first.union(calendars[1:])
+    if command == 'total':
+        return [(cid, merged.get_total_time())]
+    if command == 'gaps':
+        return [(cid,) + t for t in merged.gaps(params['start'], params['end'])]
+    covered = merged.histogram(params['origin'], params['width'], params['buckets'])
+    return [(cid, params['origin'] + k * params['width'], c)
+            for (k, c) in enumerate(covered)]
+
+def write(rows, out, fmt, command):
+    if command in ('total',):
+        fields = ['id', 'total']
+    elif command == 'histogram':
+        fields = ['id', 'bucket', 'covered']
+    else:
+        fields = ['id', 'start', 'end']
+    if fmt == 'ndjson':
+        for row in rows:
+            out.write(json.dumps(dict(zip(fields, [format_value(v) for v in row]))))
+            out.write('\n')
+    else:
+        writer = csv.writer(out)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow([format_value(v) for v in row])
+
+class Timer(object):
+    ''' Reports how long each stage took on stderr, if enabled.'''
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.last    = time.time()
+
+    def stage(self, name):
+        now = time.time()
+        if self.enabled:
+            sys.stderr.write('%s: %.3fs\n' % (name, now - self.last))
+        self.last = now
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m time_intervals',
+                                     description='Batch operations on interval files.')
+    parser.add_argument('command', choices=COMMANDS)
+    parser.add_argument('files', nargs='+',
+                        help='input files; for subtract, the first one minus the rest')
+    parser.add_argument('--format', choices=['csv', 'ndjson', 'binary'], default='csv')
+    parser.add_argument('--output-format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--output', help='output file (default: stdout)')
+    parser.add_argument('--time-type', choices=['auto', 'int', 'float', 'datetime'],
+                        default='auto')
+    parser.add_argument('--binary-type', choices=['d', 'q'], default='d')
+    parser.add_argument('--start', help='gaps: window start')
+    parser.add_argument('--end', help='gaps: window end')
+    parser.add_argument('--origin', help='histogram: start of the first bucket')
+    parser.add_argument('--width', help='histogram: bucket width (seconds for datetimes)')
+    parser.add_argument('--buckets', type=int, help='histogram: number of buckets')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes working on independent calendars')
+    parser.add_argument('--timing', action='store_true',
+                        help='report the time taken by each stage on stderr')
+    return parser
+
+def main(argv=None):
+    args   = build_parser().parse_args(argv)
+    timer  = Timer(args.timing)
+    params = {}
+    if args.command == 'gaps':
+        if args.start is None or args.end is None:
+            raise SystemExit('gaps needs --start and --end')
+        params['start'] = parse_time(args.start, args.time_type)
+        params['end']   = parse_time(args.end, args.time_type)
+    elif args.command == 'histogram':
+        if args.origin is None or args.width is None or args.buckets is None:
+            raise SystemExit('histogram needs --origin, --width and --buckets')
+        params['origin']  = parse_time(args.origin, args.time_type)
+        time_type = args.time_type
+        if time_type == 'auto' and isinstance(params['origin'], datetime):
+            time_type = 'datetime'
+        params['width']   = parse_duration(args.width, time_type)
+        params['buckets'] = args.buckets
+
+    files = [load(path, args.format, args.time_type, args.binary_type)
+             for path in args.files]
+    timer.stage('load')
+
+    # ids in order of first appearance
+    ids = dict.fromkeys(cid for calendars in files for cid in calendars)
+    tasks = [(args.command, cid, [f.get(cid, Intervals([])) for f in files], params)
+             for cid in ids]
+
+    # results are written as they come in, not collected first
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                chunksize = max(1, len(tasks) // (4 * args.workers))
+                results = executor.map(run, tasks, chunksize=chunksize)
+                write((row for rows in results for row in rows), out,
+                      args.output_format, args.command)
+        else:
+            results = (run(task) for task in tasks)
+            write((row for rows in results for row in rows), out,
+                  args.output_format, args.command)
+    finally:
+        if args.output:
+            out.close()
+    timer.stage('%s and write' % args.command)
+
+if __name__ == '__main__':
+    main()
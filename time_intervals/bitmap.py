@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+'''
+bitmap.py - Fixed-resolution bitmap representation of time intervals.
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from time_intervals.intervals import Intervals, IntervalsError
+
+class Bitmap(object):
+    ''' A calendar rasterized onto a fixed grid of n_slots slots, each
+    resolution long, the first one starting at origin. Slot i covers
+    [origin + i*resolution, origin + (i+1)*resolution). The slots are
+    packed into a Python int, bit i standing for slot i, so set operations
+    between calendars on the same grid are single big-integer operations.
+    '''
+
+    def __init__(self, origin, resolution, n_slots, bits=0):
+        self.origin     = origin
+        self.resolution = resolution
+        self.n_slots    = n_slots
+        self.bits       = bits & ((1 << n_slots) - 1)
+
+    @classmethod
+    def from_intervals(cls, intervals, origin, resolution, n_slots, partial=False):
+        ''' Rasterizes an Intervals object. By default a slot is set only
+        if the intervals cover it entirely; with partial set to True a slot
+        is set if the intervals cover any of it. Times outside the grid are
+        ignored.'''
+        bits = 0
+        for (start, end) in intervals.toTupleList():
+            lo = Bitmap.slot_of(start, origin, resolution)
+            if not partial and origin + lo * resolution < start:
+                lo += 1
+            hi = Bitmap.slot_of(end, origin, resolution)
+            if partial and origin + hi * resolution < end:
+                hi += 1
+            lo = max(lo, 0)
+            hi = min(hi, n_slots)
+            if lo < hi:
+                bits |= ((1 << (hi - lo)) - 1) << lo
+        return cls(origin, resolution, n_slots, bits)
+
+    @staticmethod
+    def slot_of(time, origin, resolution):
+        ''' Utility function returning the index of the slot time falls in.'''
+        return int((time - origin) // resolution)
+
+    def to_intervals(self, label=None):
+        ''' Converts the bitmap back into an Intervals object, one interval
+        per run of set bits.'''
+        tuplel = []
+        x   = self.bits
+        pos = 0
+        while x:
+            # skip the run of zeros, then measure the run of ones
+            zeros = (x & -x).bit_length() - 1
+            x   >>= zeros
+            pos  += zeros
+            ones = (x ^ (x + 1)).bit_length() - 1
+            x   >>= ones
+            tuplel.append((self.origin + pos * self.resolution,
+                           self.origin + (pos + ones) * self.resolution))
+            pos  += ones
+        return Intervals(tuplel, label)
+
+    def to_bytes(self):
+        ''' Returns the slots packed into a bytearray, slot i being bit i%8
+        of byte i//8.'''
+        return bytearray(self.bits.to_bytes((self.n_slots + 7) // 8, 'little'))
+
+    @classmethod
+    def from_bytes(cls, data, origin, resolution, n_slots):
+        ''' Builds a Bitmap from the output of to_bytes().'''
+        return cls(origin, resolution, n_slots, int.from_bytes(bytes(data), 'little'))
+
+    def popcount(self):
+        ''' Returns the number of set slots.'''
+        return bin(self.bits).count('1')
+
+    def get_total_time(self):
+        ''' Returns the total amount of time in the set slots.'''
+        return self.popcount() * self.resolution
+
+    def check_compatible(self, other):
+        ''' Utility function for checking that two bitmaps share a grid.'''
+        if (self.origin != other.origin or
+            self.resolution != other.resolution or
+            self.n_slots != other.n_slots):
+            raise IntervalsError('Bitmaps on different grids')
+
+    def __and__(self, other):
+        self.check_compatible(other)
+        return Bitmap(self.origin, self.resolution, self.n_slots, self.bits & other.bits)
+
+    def __or__(self, other):
+        self.check_compatible(other)
+        return Bitmap(self.origin, self.resolution, self.n_slots, self.bits | other.bits)
+
+    def __sub__(self, other):
+        ''' AND NOT: the slots set in self but not in other.'''
+        self.check_compatible(other)
+        return Bitmap(self.origin, self.resolution, self.n_slots, self.bits & ~other.bits)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self.__dict__ == other.__dict__
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return str(dict(origin=repr(self.origin), resolution=repr(self.resolution),
+                        n_slots=self.n_slots, bits=bin(self.bits)))
+
+def and_all(bitmaps):
+    ''' Intersects a non-empty list of bitmaps on the same grid.'''
+    result = bitmaps[0]
+    for b in bitmaps[1:]:
+        result = result & b
+    return result
+
+def or_all(bitmaps):
+    ''' Unites a non-empty list of bitmaps on the same grid.'''
+    result = bitmaps[0]
+    for b in bitmaps[1:]:
+        result = result | b
+    return result
+
+def intersect(list_of_intervals, origin, resolution, n_slots):
+    ''' Bitmap path for Intervals.intersect(): rasterizes every calendar
+    onto the grid, ANDs them and converts the result back to Intervals.
+    Only slots fully covered by every calendar survive.'''
+    bitmaps = [Bitmap.from_intervals(i, origin, resolution, n_slots)
+               for i in list_of_intervals]
+    return and_all(bitmaps).to_intervals(list_of_intervals[0].label)
+
+def union(list_of_intervals, origin, resolution, n_slots):
+    ''' Bitmap path for Intervals.union(). Partially covered slots count
+    as covered.'''
+    bitmaps = [Bitmap.from_intervals(i, origin, resolution, n_slots, partial=True)
+               for i in list_of_intervals]
+    return or_all(bitmaps).to_intervals(list_of_intervals[0].label)
+
+def subtract(intervals, list_of_others, origin, resolution, n_slots):
+    ''' Bitmap path for Intervals.subtract(): keeps the slots fully covered
+    by intervals and not touched by any of list_of_others.'''
+    result = Bitmap.from_intervals(intervals, origin, resolution, n_slots)
+    if list_of_others:
+        others = [Bitmap.from_intervals(i, origin, resolution, n_slots, partial=True)
+                  for i in list_of_others]
+        result = result - or_all(others)
+    return result.to_intervals(intervals.label)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+'''
+cache.py - Content-addressed memoization of operations on Intervals.
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import json
+import hashlib
+import tempfile
+from decimal import Decimal
+from datetime import date, datetime
+from collections import OrderedDict
+
+from time_intervals.intervals import Intervals
+
+# time types that can be stored on disk: tag -> (encode, decode)
+TIME_TYPES = {
+    'number':   (lambda t: t, lambda v: v),
+    'decimal':  (str, Decimal),
+    'date':     (date.isoformat, date.fromisoformat),
+    'datetime': (datetime.isoformat, datetime.fromisoformat),
+}
+
+def time_type(t):
+    ''' Utility function returning the TIME_TYPES tag of a time, or None.'''
+    if isinstance(t, bool):
+        return None
+    if isinstance(t, (int, float)):
+        return 'number'
+    if isinstance(t, Decimal):
+        return 'decimal'
+    if isinstance(t, datetime):
+        return 'datetime'
+    if isinstance(t, date):
+        return 'date'
+    return None
+
+class ResultCache(object):
+    ''' Memoizes intersect, union and subtract. Results are keyed by the
+    operation and the fingerprints of the operands, so identical inputs hit
+    the cache whichever objects hold them. Lookups go to an in-process LRU
+    first, then, if a directory is given, to an on-disk store shared by
+    every process and run using that directory. The disk store is evicted
+    oldest-first once it grows past max_bytes. Entries on disk are plain
+    JSON data, never code, and only results with numeric, Decimal, date or
+    datetime times are stored there; others stay in memory.
+
+    Results handed out from memory are shared between callers and must be
+    treated as read-only.
+    '''
+
+    def __init__(self, directory=None, max_entries=256, max_bytes=64*1024*1024):
+        self.memory      = OrderedDict()
+        self.max_entries = max_entries
+        self.directory   = directory
+        self.max_bytes   = max_bytes
+        self.disk_bytes  = 0
+        if directory is not None:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self.disk_bytes = sum(size for (path, mtime, size) in self.disk_entries())
+
+    @staticmethod
+    def key(op, intervals, operands):
+        ''' Utility function building the cache key of an operation.'''
+        parts = [op, intervals.fingerprint()]
+        parts.extend(o.fingerprint() for o in operands)
+        return hashlib.sha1('/'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        ''' Returns the cached result for key, or None.'''
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.directory is None:
+            return None
+        path = os.path.join(self.directory, key + '.json')
+        try:
+            with open(path) as f:
+                result = ResultCache.decode(f.read())
+            # refresh the entry so eviction spares it
+            os.utime(path, None)
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+        self.remember(key, result)
+        return result
+
+    @staticmethod
+    def encode(result):
+        ''' Utility function serializing a result to JSON, or returning None
+        if its times cannot be.'''
+        tuples = result.toTupleList()
+        tags   = set(time_type(t) for interval in tuples for t in interval)
+        if len(tags) > 1 or None in tags:
+            return None
+        tag = tags.pop() if tags else 'number'
+        encode = TIME_TYPES[tag][0]
+        return json.dumps({'label': result.label, 'type': tag,
+                           'intervals': [[encode(s), encode(e)] for (s, e) in tuples]})
+
+    @staticmethod
+    def decode(text):
+        ''' The inverse of encode().'''
+        data = json.loads(text)
+        decode = TIME_TYPES[data['type']][1]
+        return Intervals([(decode(s), decode(e)) for (s, e) in data['intervals']],
+                         data['label'])
+
+    def put(self, key, result):
+        self.remember(key, result)
+        if self.directory is None:
+            return
+        text = ResultCache.encode(result)
+        if text is None:
+            return
+        # write to a temporary file and rename, so readers in other
+        # processes never see a partial entry
+        (fd, tmp) = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        path = os.path.join(self.directory, key + '.json')
+        os.replace(tmp, path)
+        self.disk_bytes += os.path.getsize(path)
+        if self.disk_bytes > self.max_bytes:
+            self.evict()
+
+    def remember(self, key, result):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def disk_entries(self):
+        ''' Utility function listing (path, mtime, size) of the entries on
+        disk.'''
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_mtime, st.st_size))
+        return entries
+
+    def evict(self):
+        ''' Deletes the least recently used entries on disk until the store
+        is down to three quarters of max_bytes.'''
+        entries = sorted(self.disk_entries(), key=lambda e: e[1])
+        total   = sum(e[2] for e in entries)
+        target  = self.max_bytes * 3 // 4
+        for (path, mtime, size) in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self.disk_bytes = total
+
+    def clear(self):
+        self.memory.clear()
+        if self.directory is not None:
+            for (path, mtime, size) in self.disk_entries():
+                os.remove(path)
+            self.disk_bytes = 0
+
+    def run(self, op, intervals, operands, compute):
+        ''' Utility function returning the cached result of op, or calling
+        compute() and caching its result. Operands that are not Intervals
+        objects (e.g. RecurringIntervals) have no fingerprint, so such
+        operations bypass the cache.'''
+        if not all(isinstance(o, Intervals) for o in operands):
+            return compute()
+        key = ResultCache.key(op, intervals, operands)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            if result is intervals:
+                # subtract() may hand back its own operand; cache a copy
+                # that later writes to the operand cannot reach
+                result = Intervals(result.toDictList(), result.label)
+            self.put(key, result)
+        return result
+
+    def intersect(self, intervals, list_of_others):
+        return self.run('intersect', intervals, list_of_others,
+                        lambda: intervals.intersect(list_of_others))
+
+    def union(self, intervals, list_of_others):
+        return self.run('union', intervals, list_of_others,
+                        lambda: intervals.union(list_of_others))
+
+    def subtract(self, intervals, other):
+        if other is None:
+            return intervals.subtract(other)
+        operands = other if isinstance(other, list) else [other]
+        return self.run('subtract', intervals, operands,
+                        lambda: intervals.subtract(other))
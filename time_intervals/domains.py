@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+'''
+domains.py - Adapters describing the time classes/types Intervals can use.
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from decimal import Decimal
+from datetime import date, datetime, timedelta
+
+class TimeDomain(object):
+    ''' Describes a time class/type to the Intervals algorithms.
+    zero: the zero duration, i.e. what differencing two equal times gives.
+    If None, it is computed as t - t from a time of the domain, which works
+    for any type supporting subtraction.
+    to_key: a function mapping a time to an int or float, preserving
+    order, that sorting compares instead of the times themselves. Worth it
+    for types with slow rich comparisons; types compared in C, like date
+    and datetime, sort faster by themselves. None means the times are
+    compared directly.
+    '''
+
+    def __init__(self, zero=None, to_key=None):
+        self.zero   = zero
+        self.to_key = to_key
+
+    def zero_for(self, time):
+        ''' Returns the zero duration to start sums of differences of times
+        like time with.'''
+        if self.zero is None:
+            return time - time
+        return self.zero
+
+DOMAINS = {}
+
+# used for any time class/type that has not been registered
+GENERIC = TimeDomain()
+
+def register_domain(time_class, domain):
+    ''' Registers the TimeDomain of a time class/type. It also applies to
+    its subclasses, unless they are registered themselves.'''
+    DOMAINS[time_class] = domain
+
+def get_domain(time):
+    ''' Returns the TimeDomain for the class/type of time.'''
+    for cls in type(time).__mro__:
+        if cls in DOMAINS:
+            return DOMAINS[cls]
+    return GENERIC
+
+register_domain(int, TimeDomain(0))
+register_domain(float, TimeDomain(0.0))
+register_domain(Decimal, TimeDomain(Decimal(0)))
+register_domain(date, TimeDomain(timedelta()))
+register_domain(datetime, TimeDomain(timedelta()))
@@ -19,20 +19,194 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import os
 import math
+import random
 import copy
+import bisect
+import hashlib
+import weakref
+import contextlib
+from array import array
+try:
+    from collections.abc import Sequence
+except ImportError: # python 2
+    from collections import Sequence
+try:
+    import numpy
+except ImportError:
+    numpy = None
 from datetime import datetime, timedelta
 
+from time_intervals.domains import get_domain
+
 class IntervalsError(Exception):
     pass
 
 class IntervalsConstructionError(Exception):
     pass
 
+class _SlotTree(object):
+    ''' Max segment tree over the lengths of free slots, used by
+    Intervals.allocate() to find the leftmost slot that can hold a given
+    length in O(log n). Empty leaves hold None.'''
+
+    def __init__(self, lengths):
+        size = 1
+        while size < len(lengths):
+            size *= 2
+        self.size = size
+        self.tree = [None] * (2 * size)
+        self.tree[size:size + len(lengths)] = lengths
+        for k in range(size - 1, 0, -1):
+            self.tree[k] = _SlotTree.larger(self.tree[2*k], self.tree[2*k+1])
+
+    @staticmethod
+    def larger(a, b):
+        if a is None:
+            return b
+        if b is None or a >= b:
+            return a
+        return b
+
+    def update(self, i, length):
+        k = i + self.size
+        self.tree[k] = length
+        k //= 2
+        while k:
+            self.tree[k] = _SlotTree.larger(self.tree[2*k], self.tree[2*k+1])
+            k //= 2
+
+    def leftmost(self, length):
+        ''' Returns the index of the leftmost slot at least length long, or
+        -1 if there is none.'''
+        tree = self.tree
+        if tree[1] is None or tree[1] < length:
+            return -1
+        k = 1
+        while k < self.size:
+            k *= 2
+            if tree[k] is None or tree[k] < length:
+                k += 1
+        return k - self.size
+
+class _SlotTreap(object):
+    ''' Treap of (length, slot) pairs, used by Intervals.allocate() for
+    best fit: takes out the smallest pair not below a given one, and puts
+    pairs back, in expected O(log n). Nodes are [pair, priority, left,
+    right] lists.'''
+
+    def __init__(self, pairs):
+        # build the tree over the sorted pairs in O(n), keeping on a stack
+        # the right spine of what has been built so far
+        stack = []
+        for pair in sorted(pairs):
+            node = [pair, random.random(), None, None]
+            last = None
+            while stack and stack[-1][1] < node[1]:
+                last = stack.pop()
+            node[2] = last
+            if stack:
+                stack[-1][3] = node
+            stack.append(node)
+        self.root = stack[0] if stack else None
+
+    def split(self, node, pair):
+        ''' Splits the subtree at node into the pairs below pair and the
+        rest.'''
+        if node is None:
+            return (None, None)
+        if node[0] < pair:
+            (left, right) = self.split(node[3], pair)
+            node[3] = left
+            return (node, right)
+        (left, right) = self.split(node[2], pair)
+        node[2] = right
+        return (left, node)
+
+    def merge(self, left, right):
+        ''' Joins two subtrees, all of left's pairs being below right's.'''
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left[1] > right[1]:
+            left[3] = self.merge(left[3], right)
+            return left
+        right[2] = self.merge(left, right[2])
+        return right
+
+    def insert(self, pair):
+        (left, right) = self.split(self.root, pair)
+        node = [pair, random.random(), None, None]
+        self.root = self.merge(self.merge(left, node), right)
+
+    def pop_ceiling(self, pair):
+        ''' Removes and returns the smallest pair not below pair, or None
+        if there is none.'''
+        (left, right) = self.split(self.root, pair)
+        if right is None:
+            self.root = left
+            return None
+        parent = None
+        node   = right
+        while node[2] is not None:
+            parent = node
+            node   = node[2]
+        if parent is None:
+            right = node[3]
+        else:
+            parent[2] = node[3]
+        self.root = self.merge(left, right)
+        return node[0]
+
+class IntervalsView(Sequence):
+    ''' Read-only sequence of the (start, end) tuples of an Intervals
+    object. Nothing is materialized: len() is computed from the timepoints,
+    indexing builds the single tuple asked for, and slicing returns another
+    view. A view made without a slice follows the Intervals object through
+    later writes; a sliced view keeps the interval indices it was made with.
+    '''
+
+    def __init__(self, intervals, indices=None):
+        self.intervals = intervals
+        self.indices   = indices
+
+    def __len__(self):
+        if self.indices is None:
+            return len(self.intervals.timepoints) // 2
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        indices = self.indices
+        if indices is None:
+            indices = range(len(self))
+        if isinstance(index, slice):
+            return IntervalsView(self.intervals, indices[index])
+        k   = indices[index]
+        tps = self.intervals.timepoints
+        return (tps[2*k]['time'], tps[2*k+1]['time'])
+
+    def __iter__(self):
+        if self.indices is None:
+            return self.intervals.iter_intervals()
+        return (self[i] for i in range(len(self)))
+
+    def __repr__(self):
+        return 'IntervalsView(%s)' % repr(list(self))
+
+def _map_chunk(op, args, kwargs, calendars):
+    ''' Runs op over one chunk of the calendars given to Intervals.map_op();
+    module level so that process pool workers can unpickle it.'''
+    if callable(op):
+        return [op(calendar, *args, **kwargs) for calendar in calendars]
+    return [getattr(calendar, op)(*args, **kwargs) for calendar in calendars]
+
 class Intervals(object):
     __version__ = '1.0.0'
 
-    def __init__(self, timepoints=[], label=None, paranoid=False):
+    def __init__(self, timepoints=[], label=None, paranoid=False,
+                 merge_gap=None, min_length=None, horizon=None):
         ''' 
         timepoints: This can be a list of:
         1. dicts, where each dict contains 2 keys: time and type. The type 
@@ -48,6 +222,15 @@ class Intervals(object):
         paranoid (optional): a boolean telling the class to normalize its 
         contents before every operation. The default is False, in which case
         they are normalized after every write operation.
+        merge_gap (optional): normalization also merges intervals separated
+        by a gap of at most merge_gap, not only those that touch.
+        min_length (optional): normalization also drops intervals shorter
+        than min_length.
+        Both keep calendars built from noisy data compact, so that later
+        operations have fewer timepoints to go through.
+        horizon (optional): rolling mode. On creation and after every add,
+        append and extend_sorted, intervals ending more than horizon before
+        the latest end time are evicted, see expire().
         '''
         # validate timepoints (not validating type/class of time)
         # 1. check that we have a list
@@ -74,8 +257,38 @@ class Intervals(object):
             pass
         # if paranoid is set to true, we'll sort & normalize before every op
         self.paranoid = paranoid
+        # tolerances applied by normalize
+        self.merge_gap  = merge_gap
+        self.min_length = min_length
+        # rolling mode: how much history to keep
+        self.horizon    = horizon
+        # callables notified of the time range touched by write operations
+        self.observers = []
+        # frozen objects refuse writes, see freeze()
+        self.frozen = False
+        # write operations queued by an open batch(), or None
+        self.pending = None
+        # rolling mode: the latest eviction boundary, see expire()
+        self.cutoff = None
         # sort & normalize the internal representation
         self.normalize(sort=True)
+        if self.horizon is not None:
+            self.expire()
+
+    @property
+    def timepoints(self):
+        ''' The list of timepoint dicts. Timepoints evicted by expire() are
+        dropped from it here, on the first access after an eviction.'''
+        if self.head:
+            del self.store[:self.head]
+            self.head = 0
+        return self.store
+
+    @timepoints.setter
+    def timepoints(self, timepoints):
+        self.store = timepoints
+        # number of expired timepoints at the front of store
+        self.head  = 0
 
     @staticmethod
     def validate_intervals(timepoints):
@@ -114,8 +327,11 @@ class Intervals(object):
         return dictl
 
     def toDictList(self):
-        ''' Output the intervals in timepoint dict form.'''
+        ''' Output the intervals in timepoint dict form. A frozen object
+        returns a copy, so that its sharers cannot alter it.'''
         if self.paranoid: self.normalize()
+        if self.frozen:
+            return [dict(tp) for tp in self.timepoints]
         return self.timepoints
 
     def toTupleList(self):
@@ -131,26 +347,126 @@ class Intervals(object):
                     tuplel.append((start, tp['time']))
         return tuplel
 
+    def iter_intervals(self):
+        '''Generator yielding the intervals as (start, end) tuples, without
+        building the whole list like toTupleList().'''
+        if self.paranoid: self.normalize()
+        tps = self.timepoints
+        for i in range(0, len(tps), 2):
+            yield (tps[i]['time'], tps[i+1]['time'])
+
+    def view(self):
+        '''Returns a read-only IntervalsView of the intervals.'''
+        if self.paranoid: self.normalize()
+        return IntervalsView(self)
+
+    def export_buffers(self, typecode=None):
+        '''Exports the start and end times as two read-only memoryviews of
+        packed arrays, e.g. for numpy.frombuffer(). Only numeric times can be
+        exported. typecode is an array module typecode; by default 'q'
+        (64-bit integers) is used if every time is an int, 'd' (doubles)
+        otherwise.'''
+        if self.paranoid: self.normalize()
+        times = [tp['time'] for tp in self.timepoints]
+        for t in times:
+            if isinstance(t, bool) or not isinstance(t, (int, float)):
+                raise IntervalsError('Only numeric times can be exported')
+        if typecode is None:
+            typecode = 'q'
+            if any(isinstance(t, float) for t in times):
+                typecode = 'd'
+        starts = array(typecode, times[0::2])
+        ends   = array(typecode, times[1::2])
+        return (memoryview(starts).toreadonly(), memoryview(ends).toreadonly())
+
     @staticmethod
-    def sort_timepoints(tps):
+    def sort_timepoints(tps, method='auto'):
         ''' Sorts timepoints (list of dicts format) according to time. If 
         a start & end have the same time, the end will appear before the 
-        start.'''
+        start. Already sorted lists are left alone after one scan. With
+        method 'counting', int times are counting sorted when their span is
+        small next to the number of timepoints.'''
+        if len(tps) < 2:
+            return
+        previous = tps[0]
+        for tp in tps:
+            if (tp['time'] < previous['time'] or
+                (tp['time'] == previous['time'] and
+                 tp['type'] == 'end' and previous['type'] == 'start')):
+                break
+            previous = tp
+        else:
+            return
+        if all(type(tp['time']) is int for tp in tps):
+            if method == 'counting' and Intervals.counting_sort(tps):
+                return
+            # one composite key: ends before starts on equal times
+            tps.sort(key=lambda x: 2 * x['time'] + (x['type'] == 'start'))
+            return
+        domain = get_domain(tps[0]['time'])
         # sort ends before starts in the first pass (lexicographic)
         tps.sort(key=lambda x: x['type'])
         # sort by time in the second pass (it's stable so it ensures 
         # end before start if times are equal)
-        tps.sort(key=lambda x: x['time'])    
+        if domain.to_key is not None:
+            to_key = domain.to_key
+            tps.sort(key=lambda x: to_key(x['time']))
+        else:
+            tps.sort(key=lambda x: x['time'])
+
+    @staticmethod
+    def counting_sort(tps):
+        ''' Utility function: stable counting sort of timepoints with int
+        times, on the composite key of sort_timepoints. Returns False,
+        leaving tps alone, if the keys span more than four slots per
+        timepoint.'''
+        keys = [2 * tp['time'] + (tp['type'] == 'start') for tp in tps]
+        low  = min(keys)
+        span = max(keys) - low + 1
+        if span > 4 * len(tps):
+            return False
+        # positions[k] is where the next timepoint with key low+k goes
+        positions = [0] * (span + 1)
+        for k in keys:
+            positions[k - low + 1] += 1
+        for k in range(1, len(positions)):
+            positions[k] += positions[k-1]
+        ordered = [None] * len(tps)
+        for (tp, k) in zip(tps, keys):
+            ordered[positions[k - low]] = tp
+            positions[k - low] += 1
+        tps[:] = ordered
+        return True
+
+    @staticmethod
+    def bisect_timepoints(tps, time, lo=0, hi=None):
+        ''' Binary search in a sorted list of timepoint dicts. Returns the
+        index of the first timepoint whose time is strictly greater than
+        time, like bisect.bisect_right.'''
+        if hi is None:
+            hi = len(tps)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if time < tps[mid]['time']:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
 
     def sort(self):
         ''' Sorts timepoints according to time. If a start & end have the
         same time, the end will appear before the start.'''
+        self.check_writable()
         if self.timepoints:
             Intervals.sort_timepoints(self.timepoints)
 
     def normalize(self, sort=False):
         ''' Normalizes timepoints, meaning it optionally sorts them,  merges 
-        overlapping and adjacent intervals, and sanity checks the output.'''
+        overlapping and adjacent intervals, and sanity checks the output.
+        A frozen object was normalized when it was frozen, and is left
+        alone.'''
+        if self.frozen:
+            return
         if self.timepoints:
             # Unless sort is set to True, assume the input is already sorted
             if sort or self.paranoid:
@@ -184,6 +500,19 @@ class Intervals(object):
                     if flag == 1:
                         clean_tps.append(t)
                     flag -= 1
+            # merge intervals separated by small gaps
+            if self.merge_gap is not None:
+                self.timepoints = clean_tps
+                clean_tps = []
+                for t in self.timepoints:
+                    if (t['type'] == 'start' and clean_tps and
+                        t['time'] - clean_tps[-1]['time'] <= self.merge_gap):
+                        clean_tps.pop()
+                    else:
+                        clean_tps.append(t)
+            # remove short intervals
+            if self.min_length is not None:
+                clean_tps = Intervals.filter_short(clean_tps, self.min_length)[0]
             self.timepoints = clean_tps
             self.sanity_check()
 
@@ -210,8 +539,14 @@ class Intervals(object):
         return str(self.serialise())
 
     def __eq__(self, other):
+        # observers are deliberately left out, they are not content
         if type(other) is type(self):
-            return self.__dict__ == other.__dict__
+            return (self.timepoints == other.timepoints and
+                    self.label == other.label and
+                    self.paranoid == other.paranoid and
+                    self.merge_gap == other.merge_gap and
+                    self.min_length == other.min_length and
+                    self.horizon == other.horizon)
         return False
 
     def __ne__(self, other):
@@ -223,6 +558,14 @@ class Intervals(object):
             label       = str(self.label),
             )
 
+    def fingerprint(self):
+        ''' Returns a hex digest of the content (intervals and label), so
+        that equal content gives equal fingerprints across processes and
+        runs.'''
+        if self.paranoid: self.normalize()
+        content = repr((self.label, self.toTupleList()))
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
     def is_empty(self):
         if self.paranoid: self.normalize()
         if self.timepoints == []:
@@ -234,6 +577,7 @@ class Intervals(object):
         ''' Adds interval(s), expressed as a list of timepoint dicts or a list
         of interval tuples, to the Intervals object.'''
         # no need for a normalization, it will happen in the end
+        self.check_writable()
         # validate input
         if not timepoints:
             return
@@ -241,27 +585,284 @@ class Intervals(object):
         if isinstance(timepoints, list):
             (dict_init, tuple_init) = Intervals.validate_intervals(timepoints)
             if dict_init and not tuple_init:
-                self.timepoints.extend(copy.deepcopy(timepoints))
-                # sort and normalize
-                self.normalize(sort=True)
+                new_tps = copy.deepcopy(timepoints)
             elif tuple_init and not dict_init:
-                self.timepoints.extend(Intervals.convert_tuples_to_dicts(timepoints))
-                # sort and normalize
-                self.normalize(sort=True)
+                new_tps = Intervals.convert_tuples_to_dicts(timepoints)
             else: 
                 raise IntervalsError('Mixed input to add')
         else:
             raise IntervalsError('Ill formatted input to add')
+        if self.defer('add', new_tps):
+            return
+        self.merge_timepoints(new_tps)
+
+    def merge_timepoints(self, new_tps):
+        ''' Utility function merging validated timepoint dicts into the
+        intervals, with a single sort and normalization.'''
+        self.timepoints.extend(new_tps)
+        # sort and normalize
+        self.normalize(sort=True)
+        if self.observers:
+            times = [tp['time'] for tp in new_tps]
+            start = min(times)
+            end   = max(times)
+            if self.merge_gap is not None:
+                # the new intervals may have been joined to their
+                # neighbours across a gap that is now covered too
+                tps = self.timepoints
+                i = Intervals.bisect_timepoints(tps, start)
+                if i % 2 == 1:
+                    start = min(start, tps[i-1]['time'])
+                i = Intervals.bisect_timepoints(tps, end)
+                if i % 2 == 1:
+                    end = max(end, tps[i]['time'])
+            self.notify(start, end)
+        if self.horizon is not None:
+            self.expire()
+
+    def append(self, start, end):
+        ''' Adds the interval [start, end] to an Intervals object fed in
+        time order, in amortized O(1): there is no validation of the whole
+        list, no copy and no sort. See extend_sorted().'''
+        self.extend_sorted([(start, end)])
+
+    def extend_sorted(self, intervals):
+        ''' Adds an iterable of (start, end) tuples sorted by start time,
+        none of which may start before the last interval already held,
+        merging each into the last one when they overlap, touch or come
+        within merge_gap. Raises IntervalsError, having added the intervals
+        that preceded it, on the first one out of order. In rolling mode,
+        the part of an interval before the last eviction is dropped.'''
+        self.check_writable()
+        if self.pending is not None:
+            intervals = list(intervals)
+            for (start, end) in intervals:
+                if end < start:
+                    raise IntervalsError('Interval ends before it starts')
+            self.defer('add', Intervals.convert_tuples_to_dicts(intervals))
+            return
+        if self.paranoid: self.normalize()
+        # work on the raw store, so an eviction pending since the last
+        # append does not have to be compacted first
+        tps   = self.store
+        head  = self.head
+        first = None
+        last  = None
+        try:
+            for (start, end) in intervals:
+                if end < start:
+                    raise IntervalsError('Interval ends before it starts')
+                if self.cutoff is not None and start < self.cutoff:
+                    # already expired, up to the boundary expire() may
+                    # have clipped the last interval to
+                    if not self.cutoff < end:
+                        continue
+                    start = self.cutoff
+                if len(tps) > head and start < tps[-2]['time']:
+                    raise IntervalsError('Interval appended out of order')
+                if first is None:
+                    first = start
+                last = end
+                if len(tps) > head and (start <= tps[-1]['time'] or
+                            (self.merge_gap is not None and
+                             start - tps[-1]['time'] <= self.merge_gap)):
+                    # extend the last interval; a merge across a gap
+                    # covers it from the old end
+                    if tps[-1]['time'] < first:
+                        first = tps[-1]['time']
+                    if tps[-1]['time'] < end:
+                        tps[-1] = {'time':end, 'type':'end'}
+                elif start < end:
+                    if (self.min_length is not None and len(tps) > head and
+                        tps[-1]['time'] - tps[-2]['time'] < self.min_length):
+                        del tps[-2:]
+                    tps.append({'time':start, 'type':'start'})
+                    tps.append({'time':end, 'type':'end'})
+        finally:
+            if first is not None:
+                self.notify(first, last)
+                if self.horizon is not None:
+                    self.expire()
+
+    def freeze(self):
+        ''' Makes the Intervals object immutable: from now on every write
+        operation raises IntervalsError, and so does add_observer(), since
+        a frozen object may be shared. Returns self.'''
+        self.normalize(sort=self.paranoid)
+        self.frozen = True
+        return self
+
+    def check_writable(self):
+        ''' Utility function guarding the write operations.'''
+        if self.frozen:
+            raise IntervalsError('Intervals object is frozen')
+
+    @contextlib.contextmanager
+    def batch(self):
+        ''' Context manager queuing writes until the block exits, then
+        applying them at once. Reads inside the block see the intervals as
+        they were before it; if the block raises, its writes are discarded.'''
+        self.check_writable()
+        outermost = self.pending is None
+        if outermost:
+            self.pending = []
+        mark = len(self.pending)
+        try:
+            yield self
+        except BaseException:
+            if outermost:
+                self.pending = None
+            else:
+                del self.pending[mark:]
+            raise
+        if outermost:
+            pending = self.pending
+            self.pending = None
+            self.apply_batch(pending)
+
+    def defer(self, name, *args):
+        ''' Utility function queueing the write operation name(*args) if a
+        batch is open. Returns whether it was queued.'''
+        if self.pending is None:
+            return False
+        self.pending.append((name, args))
+        return True
+
+    def apply_batch(self, pending):
+        ''' Utility function replaying the write operations queued by
+        batch().'''
+        saved     = (self.timepoints, self.label)
+        observers = self.observers
+        touched   = []
+        self.observers  = [lambda intervals, start, end: touched.append((start, end))]
+        self.timepoints = list(self.timepoints)
+        try:
+            added = []
+            # a final no-op flushes the trailing adds
+            for (name, args) in pending + [(None, ())]:
+                if name == 'add':
+                    added.extend(args[0])
+                    continue
+                if added:
+                    self.merge_timepoints(added)
+                    added = []
+                if name is not None:
+                    getattr(self, name)(*args)
+        except BaseException:
+            (self.timepoints, self.label) = saved
+            raise
+        finally:
+            self.observers = observers
+        if touched:
+            self.notify(min(start for (start, end) in touched),
+                        max(end for (start, end) in touched))
 
-    def union(self, list_of_others):
+    def add_observer(self, callback):
+        ''' Registers callback to be called after every write operation as
+        callback(intervals, start, end), where [start, end] is the time range
+        the operation may have changed. Consumers caching anything derived
+        from the intervals only need to invalidate that range. Frozen
+        objects never change, and refuse observers.'''
+        self.check_writable()
+        self.observers.append(callback)
+
+    def remove_observer(self, callback):
+        self.observers.remove(callback)
+
+    def notify(self, start, end):
+        ''' Utility function telling the observers that [start, end] was
+        written to.'''
+        for callback in self.observers:
+            callback(self, start, end)
+
+    def diff(self, other):
+        ''' Compares self, taken as the old version of a calendar, with
+        other, the new one. Returns a tuple of two new Intervals objects:
+        the intervals added (in other but not in self) and the intervals
+        removed (in self but not in other). Both inputs are already sorted,
+        so this is a single linear merge, with no sorting.'''
+        if self.paranoid: self.normalize()
+        if other.paranoid: other.normalize()
+        old = self.timepoints
+        new = other.timepoints
+        added   = []
+        removed = []
+        in_old  = False
+        in_new  = False
+        i = 0
+        j = 0
+        while i < len(old) or j < len(new):
+            # take the earlier timepoint, ends before starts on ties
+            was_added   = in_new and not in_old
+            was_removed = in_old and not in_new
+            if j == len(new) or (i < len(old) and
+                                 (old[i]['time'], old[i]['type']) <=
+                                 (new[j]['time'], new[j]['type'])):
+                t = old[i]
+                i += 1
+                in_old = t['type'] == 'start'
+            else:
+                t = new[j]
+                j += 1
+                in_new = t['type'] == 'start'
+            is_added   = in_new and not in_old
+            is_removed = in_old and not in_new
+            if is_added != was_added:
+                added.append({'time':t['time'],
+                              'type':'start' if is_added else 'end'})
+            if is_removed != was_removed:
+                removed.append({'time':t['time'],
+                                'type':'start' if is_removed else 'end'})
+        return (Intervals(added, other.label), Intervals(removed, self.label))
+
+    def union(self, list_of_others, intern=False):
         ''' Returns a new Intervals object that is the union of self and 
-        list_of_others, a list of Intervals objects.'''
+        list_of_others, a list of Intervals objects. Operands generated on
+        demand, such as RecurringIntervals, only contribute within the span
+        of self. With intern set to True, the result is interned (see
+        InternPool).'''
         merged_timepoints = list(self.timepoints)
         # merge all lists of timepoints
         for other in list_of_others:
-            merged_timepoints.extend(other.timepoints)
+            merged_timepoints.extend(self.resolve_operand(other))
         # sorting and cleaning up will be done by the constructor
-        return Intervals(merged_timepoints, self.label)
+        result = Intervals(merged_timepoints, self.label)
+        if intern:
+            return INTERN_POOL.intern(result)
+        return result
+
+    @staticmethod
+    def map_op(calendars, op, args=(), kwargs=None, executor=None,
+               max_workers=None, chunksize=None):
+        ''' Runs op, an Intervals method name or a function of a calendar,
+        over every calendar and returns the results in the same order.
+        executor is None, 'thread', 'process' or a concurrent.futures
+        executor; process pools need op to be picklable.'''
+        calendars = list(calendars)
+        if kwargs is None:
+            kwargs = {}
+        if executor is None or not calendars:
+            return _map_chunk(op, args, kwargs, calendars)
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if chunksize is None:
+            chunksize = max(1, int(math.ceil(len(calendars) / (4.0 * max_workers))))
+        if executor in ('thread', 'process'):
+            from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+            if executor == 'thread':
+                pool = ThreadPoolExecutor(max_workers=max_workers)
+            else:
+                pool = ProcessPoolExecutor(max_workers=max_workers)
+            with pool:
+                return Intervals.map_op(calendars, op, args, kwargs, pool,
+                                        max_workers, chunksize)
+        if isinstance(executor, str):
+            raise IntervalsError('Unknown executor: %s' % executor)
+        chunks = [calendars[k:k + chunksize]
+                  for k in range(0, len(calendars), chunksize)]
+        n = len(chunks)
+        results = executor.map(_map_chunk, [op] * n, [args] * n, [kwargs] * n, chunks)
+        return [result for chunk in results for result in chunk]
 
     def get_total_time(self):
         ''' Returns the total amount of time in the intervals. When it
@@ -273,12 +874,9 @@ class Intervals(object):
         if self.timepoints:
             if self.timepoints[0]['type']=='start':
                 start = self.timepoints[0]['time']
-                # This is poor but unavoidable design: we have to return total
-                # time in whatever type/class the times are in, and there is
-                # no way to do it without this explicit check. So this will
-                # break with novel types/classes I haven't tested for here.
-                if isinstance(start, datetime):
-                    sum_val = timedelta()
+                # we have to return total time in whatever type/class the
+                # times are in, so start summing from its zero duration
+                sum_val = get_domain(start).zero_for(start)
             else:
                 raise IntervalsError()
             for t in self.timepoints[1:]:
@@ -288,6 +886,92 @@ class Intervals(object):
                     sum_val += t['time'] - start
         return sum_val
 
+    def contains_many(self, times, assume_sorted=False):
+        ''' Tells which of times fall inside the intervals, an interval
+        including its start but not its end. Returns a list of booleans, or
+        a NumPy boolean array if times is a NumPy array. Each time is looked
+        up by binary search, or, if assume_sorted is True (times being in
+        ascending order), all of them are found in a single linear merge
+        with the timepoints.'''
+        if self.paranoid: self.normalize()
+        keys = [tp['time'] for tp in self.timepoints]
+        if numpy is not None and isinstance(times, numpy.ndarray):
+            # inside iff an odd number of timepoints is at or before it
+            return numpy.searchsorted(numpy.array(keys), times, side='right') % 2 == 1
+        mask = []
+        if assume_sorted:
+            i = 0
+            for t in times:
+                while i < len(keys) and not t < keys[i]:
+                    i += 1
+                mask.append(i % 2 == 1)
+        else:
+            for t in times:
+                mask.append(bisect.bisect_right(keys, t) % 2 == 1)
+        return mask
+
+    def histogram(self, origin, bucket_width, n_buckets):
+        ''' Returns a list with the time covered by the intervals in each of
+        n_buckets consecutive buckets, bucket k being [origin + k*width,
+        origin + (k+1)*width). It is computed in a single pass over the
+        bucket edges and the intervals between them, evaluating at each
+        edge the total time covered up to it, and is vectorized with NumPy
+        when it is installed and the times are numeric.'''
+        if self.paranoid: self.normalize()
+        zero = bucket_width - bucket_width
+        if n_buckets <= 0:
+            return []
+        tps = self.timepoints
+        # skip the intervals ending before origin
+        first = Intervals.bisect_timepoints(tps, origin) // 2 * 2
+        if numpy is not None and first < len(tps) and \
+                all(isinstance(x, (int, float)) for x in (origin, bucket_width, tps[0]['time'])):
+            times  = numpy.array([tp['time'] for tp in tps[first:]])
+            starts = times[0::2]
+            ends   = times[1::2]
+            edges  = origin + bucket_width * numpy.arange(n_buckets + 1)
+            # covered(x) = lengths of the intervals ending by x, plus the
+            # part of the next one before x
+            done   = numpy.searchsorted(ends, edges, side='right')
+            cum    = numpy.concatenate(([0], numpy.cumsum(ends - starts)))
+            nxt    = numpy.minimum(done, len(starts) - 1)
+            part   = numpy.where((done < len(starts)) & (starts[nxt] < edges),
+                                 edges - starts[nxt], 0)
+            return numpy.diff(cum[done] + part).tolist()
+        covered  = []
+        cum      = zero
+        i        = first
+        for k in range(n_buckets + 1):
+            edge = origin + k * bucket_width
+            while i < len(tps) and not edge < tps[i+1]['time']:
+                cum += tps[i+1]['time'] - tps[i]['time']
+                i += 2
+            if i < len(tps) and tps[i]['time'] < edge:
+                covered.append(cum + (edge - tps[i]['time']))
+            else:
+                covered.append(cum)
+        return [covered[k+1] - covered[k] for k in range(n_buckets)]
+
+    def calendar_histogram(self, first_day, n_buckets, period='day'):
+        ''' Histogram of datetime intervals per calendar day or week.
+        Buckets are aligned to midnight of first_day, or, for period 'week',
+        to midnight of the Monday of its week. Returns a list of (bucket
+        start, covered time) tuples.'''
+        if period == 'day':
+            width = timedelta(days=1)
+        elif period == 'week':
+            width = timedelta(weeks=1)
+        else:
+            raise IntervalsError('Unknown histogram period: %s' % period)
+        if isinstance(first_day, datetime):
+            origin = first_day.replace(hour=0, minute=0, second=0, microsecond=0)
+        else:
+            origin = datetime(first_day.year, first_day.month, first_day.day)
+        if period == 'week':
+            origin -= timedelta(days=origin.weekday())
+        covered = self.histogram(origin, width, n_buckets)
+        return [(origin + k * width, covered[k]) for k in range(n_buckets)]
+
     def find_interval_of_length(self, length):
         '''Returns the start time of an interval that is equal to or greater
         than length, or -1 if one does not exist. Length has to be of the
@@ -303,21 +987,129 @@ class Intervals(object):
                     return start
         return -1
 
+    @staticmethod
+    def earliest_common_slot(calendars, length, after, before=None):
+        ''' Returns the start time of the earliest slot of at least length,
+        starting no earlier than after and, if before is given, ending no
+        later than before, during which every one of calendars, a list of
+        Intervals objects holding free time, is free. Returns -1 if there is
+        no such slot. Gives the same answer as intersecting the calendars
+        and calling find_interval_of_length() on the result clipped to the
+        window, but only walks as far as the answer: each calendar keeps a
+        cursor that is moved forward by binary search, and the candidate
+        start leaps to the next start of whichever calendar is busy at it,
+        or past the end of the shortest common interval.'''
+        timelines = []
+        for calendar in calendars:
+            if calendar.paranoid: calendar.normalize()
+            timelines.append(calendar.timepoints)
+        cursors = [0] * len(timelines)
+        t = after
+        while True:
+            if before is not None and before < t + length:
+                return -1
+            end   = before
+            moved = False
+            for (k, tps) in enumerate(timelines):
+                i = Intervals.bisect_timepoints(tps, t, cursors[k])
+                if i % 2 == 0:
+                    # t falls in a gap of this calendar, or after its last
+                    # interval
+                    if i == len(tps):
+                        return -1
+                    cursors[k] = i
+                    t = tps[i]['time']
+                    moved = True
+                    break
+                cursors[k] = i - 1
+                if end is None or tps[i]['time'] < end:
+                    end = tps[i]['time']
+            if moved:
+                continue
+            if end is None or end - t >= length:
+                return t
+            t = end
+
+    def allocate(self, durations, policy='first_fit', earliest=None):
+        ''' Assigns a slot to each of durations, treating the intervals as
+        free time. policy is 'first_fit' (the earliest interval long enough)
+        or 'best_fit' (the shortest interval long enough, earliest on ties).
+        Slots are carved from the beginning of the chosen interval, and
+        nothing before earliest is handed out. Returns a tuple of:
+        1. a list with a (start, end) tuple for each duration, in the same
+        order, or None where a duration could not be placed, and
+        2. a new Intervals object holding the free time left over.
+        The Intervals object itself is not altered. Each placement costs
+        O(log n) (expected, for best fit), instead of a
+        find_interval_of_length() and a subtract().'''
+        if self.paranoid: self.normalize()
+        if policy != 'first_fit' and policy != 'best_fit':
+            raise IntervalsError('Unknown allocation policy: %s' % policy)
+        tps = self.timepoints
+        # free time before earliest is kept aside, untouched
+        kept = []
+        i = 0
+        if earliest is not None:
+            i = Intervals.bisect_timepoints(tps, earliest)
+            for j in range(0, i - i % 2, 2):
+                kept.append((tps[j]['time'], tps[j+1]['time']))
+        starts = []
+        ends   = []
+        if i % 2 == 1:
+            if tps[i-1]['time'] < earliest:
+                kept.append((tps[i-1]['time'], earliest))
+            starts.append(earliest)
+            ends.append(tps[i]['time'])
+            i += 1
+        for j in range(i, len(tps), 2):
+            starts.append(tps[j]['time'])
+            ends.append(tps[j+1]['time'])
+        lengths = [e - s for (s, e) in zip(starts, ends)]
+
+        if policy == 'first_fit':
+            index = _SlotTree(lengths)
+        else:
+            # (length, slot) pairs, so ties go to the earliest slot
+            index = _SlotTreap((l, k) for (k, l) in enumerate(lengths))
+        placements = []
+        for d in durations:
+            if policy == 'first_fit':
+                k = index.leftmost(d)
+            else:
+                pair = index.pop_ceiling((d, -1))
+                k = pair[1] if pair is not None else -1
+            if k == -1:
+                placements.append(None)
+                continue
+            placements.append((starts[k], starts[k] + d))
+            starts[k] = starts[k] + d
+            # exhausted slots leave the index
+            if policy == 'first_fit':
+                index.update(k, ends[k] - starts[k] if starts[k] < ends[k] else None)
+            elif starts[k] < ends[k]:
+                index.insert((ends[k] - starts[k], k))
+
+        for (s, e) in zip(starts, ends):
+            if s < e:
+                kept.append((s, e))
+        return (placements, Intervals(kept, self.label))
+
     def trim_to_time(self, total_time):
         ''' Trims the intervals from the beginning, so they sum up to
         total_time. Alters the Intervals object itself, returns nothing.'''
+        self.check_writable()
+        if self.defer('trim_to_time', total_time):
+            return
         if self.paranoid: self.normalize()
         if not self.timepoints:
             return
+        old_end     = self.timepoints[-1]['time']
         trimmed_tps = []
         sum_val     = 0
-        # Here we have the same unavoidable problem as in get_total_time,
-        # namely we need to start summing with the right type/class, so we 
-        # have to check it explicitly.
+        # as in get_total_time, start summing with the right type/class
         if self.timepoints[0]['type']=='start':
             start = self.timepoints[0]['time']
-            if isinstance(start, datetime):
-                sum_val = timedelta()
+            sum_val = get_domain(start).zero_for(start)
         else:
             raise IntervalsError()
         for t in self.timepoints: # redoing the first timepoint
@@ -331,31 +1123,92 @@ class Intervals(object):
                     trimmed_tps.append({'time':t['time']-trim_time, 'type':'end'})
                     self.timepoints = trimmed_tps
                     # no sort or norm required
+                    self.notify(trimmed_tps[-1]['time'], old_end)
                     return
                 else:
                     trimmed_tps.append(t)
                 if sum_val == total_time:
                     # no sort or norm required
                     self.timepoints = trimmed_tps
+                    if t['time'] != old_end:
+                        self.notify(t['time'], old_end)
                     return
         if sum_val < total_time:
             raise IntervalsError('Requested to trim intervals to more than their total time')
 
     def remove_intervals_smaller_than(self, duration):
         ''' Filters out intervals that are smaller than a threshold'''
+        self.check_writable()
+        if self.defer('remove_intervals_smaller_than', duration):
+            return
         if self.paranoid: self.normalize()
-        toremove = []
-        for tp in self.timepoints:
-            if tp['type'] == 'start':
-                previous = tp
+        (self.timepoints, removed) = Intervals.filter_short(self.timepoints, duration)
+        # no sort or norm required
+        if removed:
+            self.notify(removed[0], removed[1])
+
+    @staticmethod
+    def filter_short(tps, duration):
+        ''' Utility function dropping the intervals shorter than duration
+        from a sorted list of timepoints, in a single pass. Returns the kept
+        timepoints, and the (first start, last end) of the removed intervals,
+        or None if nothing was removed.'''
+        kept    = []
+        removed = None
+        for i in range(0, len(tps), 2):
+            if tps[i+1]['time'] - tps[i]['time'] < duration:
+                if removed is None:
+                    removed = (tps[i]['time'], tps[i+1]['time'])
+                else:
+                    removed = (removed[0], tps[i+1]['time'])
             else:
-                d = tp['time'] - previous['time']
-                if d < duration:
-                    toremove.append(previous)
-                    toremove.append(tp)
-        for tp in toremove:
-            self.timepoints.remove(tp)
-            # no sort or norm required
+                kept.append(tps[i])
+                kept.append(tps[i+1])
+        return (kept, removed)
+
+    def expire(self, now=None):
+        ''' Rolling mode eviction: drops everything before now - horizon,
+        clipping the interval that straddles that boundary. now defaults to
+        the latest end time. The boundary is found by a galloping search
+        from the oldest timepoint, and evicting only moves self.head past
+        the expired timepoints; they are deleted in one go once they
+        outnumber the live ones, or on the next access to timepoints. So
+        appending to a long-running stream costs amortized O(1) per
+        evicted interval, however large the window.'''
+        if self.horizon is None:
+            return
+        self.check_writable()
+        if self.defer('expire', now) or len(self.store) == self.head:
+            return
+        tps  = self.store
+        head = self.head
+        if now is None:
+            now = tps[-1]['time']
+        cutoff = now - self.horizon
+        if self.cutoff is None or self.cutoff < cutoff:
+            self.cutoff = cutoff
+        if not tps[head]['time'] < cutoff:
+            return
+        first = tps[head]['time']
+        # gallop to a range holding the boundary, then bisect it
+        lo   = head
+        step = 1
+        while lo + step < len(tps) and not cutoff < tps[lo + step]['time']:
+            lo   += step
+            step *= 2
+        i = Intervals.bisect_timepoints(tps, cutoff, lo, min(lo + step, len(tps)))
+        if i % 2 == 1:
+            # the interval at i-1 straddles the cutoff, keep its tail
+            head = i - 1
+            tps[head] = {'time':cutoff, 'type':'start'}
+        else:
+            head = i
+        self.head = head
+        if head > len(tps) - head:
+            del tps[:head]
+            self.head = 0
+        # no sort or norm required
+        self.notify(first, cutoff)
 
     def complement(self, absolute_start, absolute_end):
         ''' Turns a list of intervals denoting free times
@@ -363,6 +1216,9 @@ class Intervals(object):
         Replaces self.timepoints and returns nothing.
         absolute_start and absolute_end must be defined, so we know
         how to close off the ends. '''
+        self.check_writable()
+        if self.defer('complement', absolute_start, absolute_end):
+            return
         if self.paranoid: self.normalize()
         if self.timepoints:
             # figure out the start
@@ -391,6 +1247,32 @@ class Intervals(object):
             self.timepoints.append({'time':absolute_end, 'type':'end'})
             # no sort or norm required
         self.swap_label()
+        self.notify(absolute_start, absolute_end)
+
+    def gaps(self, start, end):
+        ''' Generator yielding the gaps between the intervals that fall in
+        the window [start, end), as (start, end) tuples. Unlike complement()
+        it does not alter the Intervals object, and it only walks the
+        intervals inside the window: the first one is found by binary
+        search, the rest are visited lazily as the caller consumes gaps.'''
+        if self.paranoid: self.normalize()
+        if not start < end:
+            return
+        tps = self.timepoints
+        i = Intervals.bisect_timepoints(tps, start)
+        if i % 2 == 1:
+            # start falls inside an interval, the first gap begins at its end
+            cursor = tps[i]['time']
+            i += 1
+        else:
+            cursor = start
+        while i < len(tps) and tps[i]['time'] < end:
+            if cursor < tps[i]['time']:
+                yield (cursor, tps[i]['time'])
+            cursor = tps[i+1]['time']
+            i += 2
+        if cursor < end:
+            yield (cursor, end)
 
     def swap_label(self):
         ''' Utility function to toggle label free<->busy.'''
@@ -400,83 +1282,159 @@ class Intervals(object):
         elif self.label == 'busy':
             self.label = 'free'
 
-    def intersect(self, list_of_others):
+    def resolve_operand(self, other):
+        ''' Utility function returning the timepoints of an operand of
+        union, intersect or subtract. Intervals objects are used as they
+        are, after normalizing paranoid ones. Anything else, e.g. a
+        RecurringIntervals, must provide to_intervals(start, end), and is
+        materialized only over the span of self, since that is all an
+        operation with self can use.'''
+        if isinstance(other, Intervals):
+            if other.paranoid: other.normalize()
+            return other.timepoints
+        if not self.timepoints:
+            return []
+        return other.to_intervals(self.timepoints[0]['time'],
+                                  self.timepoints[-1]['time']).timepoints
+
+    def intersect(self, list_of_others, intern=False):
         ''' Intersects Intervals in list_of_others with self. Returns
         a new Intervals object containing only those intervals that
         were in the intersection of everything. If the intersection
-        was empty, it returns None.'''
+        was empty, it returns an empty Intervals object.
+        The operands are planned before any merging: if one is empty or
+        their spans do not all overlap the answer is empty at once,
+        otherwise each operand is clipped by binary search to the span
+        common to all, and they are intersected pairwise, smallest first,
+        so intermediate results shrink as quickly as possible.
+        With intern set to True, the result is interned (see InternPool).'''
+        if intern:
+            return INTERN_POOL.intern(self.intersect(list_of_others))
         if self.paranoid: self.normalize()
-        intersection = []
-        merged_timepoints = list(self.timepoints)
-        # merge all lists of timepoints
-        for other in list_of_others:
-            merged_timepoints.extend(other.timepoints)
-        # sort the merged list
-        Intervals.sort_timepoints(merged_timepoints)
-        # walk through merged list popping up flags
-        flag     = 0
-        max_flag = len(list_of_others)+1
-        # This loop requires a sorted list as input to work correctly
-        for t in merged_timepoints:
-            if t['type'] == 'start':
-                if flag == max_flag:
-                    intersection.append({'time':t['time'], 'type':'end'})
-                flag += 1
-                if flag == max_flag:
-                    intersection.append({'time':t['time'], 'type':'start'})
-            elif t['type'] == 'end':
-                if flag == max_flag:
-                    intersection.append({'time':t['time'], 'type':'end'})
-                flag -= 1
-                if flag == max_flag:
-                    intersection.append({'time':t['time'], 'type':'start'})
-        if intersection:
-            return Intervals(intersection, self.label)
-        else:
+        operands = [self.timepoints]
+        operands.extend(self.resolve_operand(other) for other in list_of_others)
+        if not all(operands):
+            return Intervals([])
+        # the span common to all operands
+        start = max(tps[0]['time'] for tps in operands)
+        end   = min(tps[-1]['time'] for tps in operands)
+        if not start < end:
             return Intervals([])
+        operands = [Intervals.clip_timepoints(tps, start, end) for tps in operands]
+        operands.sort(key=len)
+        intersection = operands[0]
+        for tps in operands[1:]:
+            intersection = Intervals.intersect_timepoints(intersection, tps)
+            if not intersection:
+                return Intervals([])
+        return Intervals(intersection, self.label)
+
+    @staticmethod
+    def clip_timepoints(tps, start, end):
+        ''' Utility function returning the part of a sorted list of
+        timepoints holding the intervals that overlap [start, end], found by
+        binary search. Intervals sticking out of the window are kept whole.'''
+        lo = Intervals.bisect_timepoints(tps, start)
+        lo -= lo % 2
+        hi = Intervals.bisect_timepoints(tps, end, lo)
+        hi += hi % 2
+        return tps[lo:hi]
+
+    @staticmethod
+    def intersect_timepoints(a, b):
+        ''' Utility function intersecting two normalized lists of
+        timepoints in one linear merge; no sorting is needed. Returns a new
+        normalized list of timepoints.'''
+        intersection = []
+        i = 0
+        j = 0
+        while i < len(a) and j < len(b):
+            start = max(a[i]['time'], b[j]['time'])
+            end   = min(a[i+1]['time'], b[j+1]['time'])
+            if start < end:
+                intersection.append({'time':start, 'type':'start'})
+                intersection.append({'time':end, 'type':'end'})
+            # move past whichever interval ends first
+            if a[i+1]['time'] < b[j+1]['time']:
+                i += 2
+            else:
+                j += 2
+        return intersection
 
     def subtract(self, other):
         ''' Returns a new Intervals object containing those intervals in self
         that are not in other (i.e. the relative complement of other in self).
+        other can also be a list of Intervals objects, in which case the
+        relative complement of their union is computed, in a single sweep.
         '''
-        mykey = 'intervals_id'
         if self.paranoid: self.normalize()
-        if (other == None) or other.is_empty() or self.is_empty():
+        if other is None:
             return self
-        rc = []
-        for t in other.timepoints:
-            t[mykey]=1
-        for t in self.timepoints:
-            t[mykey]=2
-        
-        merged_timepoints = list(self.timepoints)
-        # merge the two lists
-        merged_timepoints.extend(other.timepoints)
-        # sort the merged list
-        Intervals.sort_timepoints(merged_timepoints)
+        list_of_others = other if isinstance(other, list) else [other]
+        others_tps = [self.resolve_operand(o) for o in list_of_others]
+        others_tps = [tps for tps in others_tps if tps]
+        if not others_tps or self.is_empty():
+            return self
+        # every other is normalized, so at most len(others_tps) of them
+        # cover any time; self weighs more than that, and the sweep is in
+        # self but in none of the others exactly when flag == mine
+        mine   = len(others_tps) + 1
+        events = [(t['time'], t['type'] == 'start', mine) for t in self.timepoints]
+        for tps in others_tps:
+            events.extend((t['time'], t['type'] == 'start', 1) for t in tps)
+        # sort by time, ends before starts. These are tuples rather than
+        # timepoint dicts, so sort_timepoints() does not apply; the list is
+        # the sorted runs of the operands one after the other, which the
+        # sort detects and merges
+        events.sort(key=lambda e: (e[0], e[1]))
         # walk through merged list popping up flags
+        rc   = []
         flag = 0
-        for t in merged_timepoints:
-            if t['type'] == 'start':
-                if flag == 2:
-                    rc.append({'time':t['time'], 'type':'end'})
-                flag = flag + t[mykey]
-                if flag == 2:
-                    rc.append({'time':t['time'], 'type':'start'})
-            elif t['type'] == 'end':
-                if flag == 2:
-                    rc.append({'time':t['time'], 'type':'end'})
-                flag = flag - t[mykey]
-                if flag == 2:
-                    rc.append({'time':t['time'], 'type':'start'})
-        # walk thru & clean id fields
-        # TODO: make mykey a class parameter, in case of collision?
-        for tp in merged_timepoints:
-            if mykey in tp:
-                del tp[mykey]
+        for (time, is_start, weight) in events:
+            if flag == mine:
+                rc.append({'time':time, 'type':'end'})
+            if is_start:
+                flag += weight
+            else:
+                flag -= weight
+            if flag == mine:
+                rc.append({'time':time, 'type':'start'})
         # in case of label disagreement, use None
-        label = None 
-        if self.label == other.label:
-            label = self.label
+        label = self.label
+        for o in list_of_others:
+            if o.label != self.label:
+                label = None
         return Intervals(rc, label)
 
+class InternPool(object):
+    ''' Pool of shared, frozen Intervals objects, one per distinct content,
+    so that thousands of identical calendars can be held once. Entries are
+    keyed by content fingerprint and by the settings Intervals objects are
+    compared on, and only weakly referenced, so they are reclaimed once
+    nothing else uses them.'''
+
+    def __init__(self):
+        self.entries = weakref.WeakValueDictionary()
+
+    def intern(self, intervals):
+        ''' Returns the shared frozen instance with the same content as
+        intervals. If there is none yet, intervals itself becomes it if it
+        is already frozen, otherwise a frozen copy does, leaving intervals
+        writable.'''
+        key = (intervals.fingerprint(), intervals.paranoid, intervals.merge_gap,
+               intervals.min_length, intervals.horizon)
+        shared = self.entries.get(key)
+        if shared is not None and shared == intervals:
+            return shared
+        if not intervals.frozen:
+            intervals = Intervals(intervals.toDictList(), intervals.label,
+                                  intervals.paranoid, intervals.merge_gap,
+                                  intervals.min_length, intervals.horizon).freeze()
+        self.entries[key] = intervals
+        return intervals
+
+    def __len__(self):
+        return len(self.entries)
+
+# the pool used by union() and intersect() when asked to intern
+INTERN_POOL = InternPool()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+'''
+join.py - Sort-merge overlap join between collections of intervals.
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from time_intervals.intervals import Intervals, IntervalsError
+
+LEFT  = 0
+RIGHT = 1
+
+def keyed_intervals(collection):
+    ''' Utility function flattening a keyed collection into (start, end,
+    key) tuples. collection is a dict, or an iterable of (key, value)
+    pairs, where each value is an Intervals object or a single (start, end)
+    tuple.'''
+    if isinstance(collection, dict):
+        collection = collection.items()
+    records = []
+    for (key, value) in collection:
+        if isinstance(value, Intervals):
+            for (start, end) in value.iter_intervals():
+                records.append((start, end, key))
+        elif isinstance(value, tuple) and len(value) == 2:
+            records.append((value[0], value[1], key))
+        else:
+            raise IntervalsError('Join values must be Intervals or (start, end) tuples')
+    return records
+
+def overlap_join(left, right):
+    ''' Returns every overlapping pair between two keyed collections of
+    intervals (see keyed_intervals()), as a list of (left key, right key,
+    (overlap start, overlap end)) tuples. Intervals that only touch do not
+    overlap. The intervals of both sides are sorted by start time once and
+    swept together, keeping the intervals still open on each side, so the
+    cost is O((n + m) log(n + m) + number of pairs), rather than a nested
+    loop of intersects.'''
+    records = [(start, end, key, LEFT) for (start, end, key) in keyed_intervals(left)]
+    records.extend((start, end, key, RIGHT) for (start, end, key) in keyed_intervals(right))
+    records.sort(key=lambda r: r[0])
+    # the intervals of each side that may still overlap what comes next
+    active = [[], []]
+    pairs  = []
+    for record in records:
+        (start, end, key, side) = record
+        if not start < end:
+            continue
+        # drop the intervals of the other side that ended by now; every
+        # one left overlaps this one
+        active[1 - side] = [r for r in active[1 - side] if start < r[1]]
+        for (o_start, o_end, o_key, o_side) in active[1 - side]:
+            overlap = (start, min(end, o_end))
+            if side == LEFT:
+                pairs.append((key, o_key, overlap))
+            else:
+                pairs.append((o_key, key, overlap))
+        active[side].append(record)
+    return pairs
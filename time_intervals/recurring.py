@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+'''
+recurring.py - Lazily generated recurring time intervals.
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from time_intervals.intervals import Intervals, IntervalsConstructionError
+
+class RecurringIntervals(object):
+    ''' A pattern of intervals repeating every period, e.g. business hours.
+    Occurrences are never stored: they are generated on demand for the
+    window an operation needs. A RecurringIntervals object can be passed
+    to Intervals.intersect(), union() and subtract() wherever an Intervals
+    object is accepted, and it is then materialized only over the span of
+    the Intervals object the operation is called on.
+    '''
+
+    def __init__(self, origin, period, offsets, durations, exceptions=None,
+                 until=None, label=None):
+        '''
+        origin: the start of the first period.
+        period: the length of a period, e.g. timedelta(weeks=1).
+        offsets: a list of offsets from the start of a period, one for each
+        interval in the pattern.
+        durations: the duration of each interval in the pattern, either a
+        list matching offsets or a single duration shared by all.
+        exceptions (optional): occurrence start times to skip, e.g. public
+        holidays.
+        until (optional): no occurrence starts at or after this time.
+        label (optional): one of the strings 'busy' or 'free'.
+        '''
+        if not isinstance(offsets, list) or not offsets:
+            raise IntervalsConstructionError('offsets must be a non-empty list')
+        if not isinstance(durations, list):
+            durations = [durations] * len(offsets)
+        if len(durations) != len(offsets):
+            raise IntervalsConstructionError('offsets and durations differ in length')
+        self.origin     = origin
+        self.period     = period
+        self.pattern    = sorted(zip(offsets, durations))
+        self.exceptions = set(exceptions) if exceptions else set()
+        self.until      = until
+        self.label      = label if label == 'busy' or label == 'free' else None
+        # how far past the start of its period an occurrence can reach
+        self.reach      = max(o + d for (o, d) in self.pattern)
+
+    def occurrences(self, start, end):
+        ''' Generator yielding, in order of start time, the (start, end)
+        tuples of the occurrences that overlap the window [start, end).'''
+        k = int((start - self.origin - self.reach) // self.period)
+        k = max(k, 0)
+        first_offset = self.pattern[0][0]
+        while True:
+            period_start = self.origin + k * self.period
+            first = period_start + first_offset
+            if not first < end or (self.until is not None and not first < self.until):
+                return
+            for (offset, duration) in self.pattern:
+                s = period_start + offset
+                if not s < end or (self.until is not None and not s < self.until):
+                    break
+                e = s + duration
+                if start < e and s not in self.exceptions:
+                    yield (s, e)
+            k += 1
+
+    def to_intervals(self, start, end):
+        ''' Materializes the occurrences in the window [start, end] into an
+        Intervals object, clipping the ones that stick out of the window.'''
+        tuplel = []
+        for (s, e) in self.occurrences(start, end):
+            s = max(s, start)
+            e = min(e, end)
+            if s < e:
+                tuplel.append((s, e))
+        return Intervals(tuplel, self.label)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+'''
+shared.py - Intervals held in shared memory for multi-process workers.
+
+Copyright (C) 2017 Sotiria Lampoudi
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import struct
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+
+from time_intervals.intervals import Intervals, IntervalsError
+
+# header: number of intervals, kind of times, label, creator's tracker
+HEADER = struct.Struct('<qqqq')
+
+KIND_INT      = 0
+KIND_FLOAT    = 1
+# datetimes are stored as integer microseconds since the epoch
+KIND_DATETIME = 2
+
+EPOCH       = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+LABELS = [None, 'busy', 'free']
+
+class SharedIntervals(object):
+    ''' A read-only Intervals object living in a multiprocessing
+    shared_memory block, so a pool of worker processes can all read one
+    copy of a large calendar. Times are packed as start0, end0, start1,
+    end1... in 64-bit ints, doubles, or, for naive datetimes, integer
+    microseconds since the epoch.
+
+    The creating process calls SharedIntervals.create() and, when every
+    worker is done, unlink(). Pickling a SharedIntervals object only sends
+    the name of the block, and unpickling attaches to it, so it can be
+    passed straight to pool workers.
+    '''
+
+    def __init__(self, name, shm=None):
+        ''' Attaches read-only to the shared block called name. create()
+        passes the block it has just allocated as shm instead.'''
+        self.owner = shm is not None
+        if shm is None:
+            shm = SharedIntervals.open_block(name)
+        self.shm  = shm
+        self.name = shm.name
+        (count, kind, label, tracker) = HEADER.unpack_from(shm.buf, 0)
+        self.count = count
+        self.kind  = kind
+        self.label = LABELS[label]
+        fmt = 'd' if kind == KIND_FLOAT else 'q'
+        self.times = shm.buf[HEADER.size:HEADER.size + 16 * count].toreadonly().cast(fmt)
+
+    @staticmethod
+    def tracker_id():
+        ''' Identifies the resource tracker of this process by the inode of
+        the pipe to it, which every process sharing that tracker (children
+        and grandchildren alike) has in common. 0 where there is none.'''
+        if os.name != 'posix':
+            return 0
+        try:
+            from multiprocessing import resource_tracker
+            return os.fstat(resource_tracker.getfd()).st_ino
+        except (ImportError, AttributeError, OSError):
+            return 0
+
+    @staticmethod
+    def open_block(name):
+        try:
+            # attaching must not make this process unlink the block on exit
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError: # python < 3.13
+            pass
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name != 'posix':
+            return shm
+        # attaching registered the block with this process' resource
+        # tracker, which would unlink it when this process exits. The
+        # tracker keeps a set of names, so if it is the creator's the
+        # registration was a no-op, and unregistering would drop the
+        # creator's own. Only a tracker of our own must forget the block.
+        creator = HEADER.unpack_from(shm.buf, 0)[3]
+        if SharedIntervals.tracker_id() != creator:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister('/' + shm.name, 'shared_memory')
+        return shm
+
+    @classmethod
+    def create(cls, intervals, name=None):
+        ''' Copies intervals into a new shared block and returns the
+        SharedIntervals object attached to it. The caller owns the block
+        and must unlink() it.'''
+        times = [tp['time'] for tp in intervals.toDictList()]
+        if all(isinstance(t, int) and not isinstance(t, bool) for t in times):
+            (kind, fmt) = (KIND_INT, 'q')
+        elif all(isinstance(t, (int, float)) for t in times):
+            (kind, fmt) = (KIND_FLOAT, 'd')
+        elif all(isinstance(t, datetime) and t.tzinfo is None for t in times):
+            (kind, fmt) = (KIND_DATETIME, 'q')
+            times = [(t - EPOCH) // MICROSECOND for t in times]
+        else:
+            raise IntervalsError('Only numeric or naive datetime times can be shared')
+        count = len(times) // 2
+        shm = shared_memory.SharedMemory(name=name, create=True,
+                                         size=HEADER.size + 8 * len(times))
+        HEADER.pack_into(shm.buf, 0, count, kind, LABELS.index(intervals.label),
+                         SharedIntervals.tracker_id())
+        struct.pack_into('<%d%s' % (len(times), fmt), shm.buf, HEADER.size, *times)
+        return cls(shm.name, shm)
+
+    def __reduce__(self):
+        return (SharedIntervals, (self.name,))
+
+    def close(self):
+        ''' Detaches this process from the block.'''
+        if self.times is None:
+            return
+        self.times.release()
+        self.times = None
+        self.shm.close()
+
+    def unlink(self):
+        ''' Closes and destroys the block. Only the creator should call it.'''
+        self.close()
+        if self.owner:
+            self.shm.unlink()
+            self.owner = False
+
+    def __del__(self):
+        # release the view first, or closing the block at exit fails with
+        # exported pointers
+        if getattr(self, 'times', None) is not None:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def decode(self, value):
+        ''' Utility function converting a stored value to a time.'''
+        if self.kind == KIND_DATETIME:
+            return EPOCH + value * MICROSECOND
+        return value
+
+    def encode(self, time):
+        ''' Utility function converting a time to its stored value.'''
+        if self.kind == KIND_DATETIME:
+            return (time - EPOCH) // MICROSECOND
+        return time
+
+    def __len__(self):
+        return self.count
+
+    def is_empty(self):
+        return self.count == 0
+
+    def bisect(self, time):
+        ''' Index of the first stored timepoint strictly after time.'''
+        value = self.encode(time)
+        times = self.times
+        lo = 0
+        hi = len(times)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if value < times[mid]:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def get_total_time(self):
+        ''' As Intervals.get_total_time(), computed on the shared buffer.'''
+        if not self.count:
+            return 0
+        total = sum(self.times[1::2]) - sum(self.times[0::2])
+        if self.kind == KIND_DATETIME:
+            return total * MICROSECOND
+        return total
+
+    def find_interval_of_length(self, length):
+        ''' As Intervals.find_interval_of_length(), computed on the shared
+        buffer.'''
+        if self.kind == KIND_DATETIME:
+            length = length // MICROSECOND
+        times = self.times
+        for i in range(0, len(times), 2):
+            if times[i+1] - times[i] >= length:
+                return self.decode(times[i])
+        return -1
+
+    def to_intervals(self, start=None, end=None):
+        ''' Copies the intervals overlapping [start, end] (by default all of
+        them) into a local Intervals object. Only that window of the buffer
+        is read.'''
+        times = self.times
+        lo = 0
+        hi = len(times)
+        if start is not None:
+            lo = self.bisect(start)
+            lo -= lo % 2
+        if end is not None:
+            hi = self.bisect(end)
+            hi += hi % 2
+        tuplel = [(self.decode(times[i]), self.decode(times[i+1]))
+                  for i in range(lo, hi, 2)]
+        return Intervals(tuplel, self.label)
+
+    def intersect(self, list_of_others):
+        ''' Intersects the shared intervals with local Intervals objects.
+        Only the part of the shared buffer within the span of the others is
+        read.'''
+        start = None
+        end   = None
+        for other in list_of_others:
+            tps = other.toDictList()
+            if not tps:
+                return Intervals([])
+            if start is None or start < tps[0]['time']:
+                start = tps[0]['time']
+            if end is None or tps[-1]['time'] < end:
+                end = tps[-1]['time']
+        return self.to_intervals(start, end).intersect(list_of_others)